@@ -27,6 +27,10 @@ class Settings(BaseSettings):
 
     # Telegram Config (only needed for FastAPI backend)
     telegram_bot_token: str | None = None
+    # Chromium used to render Telegram cards (auto-detected if unset)
+    chromium_path: str | None = None
+    # Render a header-only single-pool card and put every metric in the caption
+    telegram_lean_card: bool = False
     
     # Notion API Configuration
     notion_api_key: str | None = None
@@ -37,6 +41,12 @@ class Settings(BaseSettings):
     # Optional default pool
     default_pool_address: str | None = None
     
+    # Persistent SQLite cache for historical snapshots (opt-in; unset to disable)
+    snapshot_cache_path: str | None = None
+    
+    # Logging level (DEBUG, INFO, WARNING, ...)
+    log_level: str = "INFO"
+    
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -1,9 +1,13 @@
 """
 Pydantic models for request/response validation.
 """
+import re
 from datetime import datetime
 from enum import Enum
-from pydantic import BaseModel, EmailStr, Field, model_validator
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
+
+# Pool address (0x + 40 hex chars) or full V2 pool ID (address + 24 hex chars)
+_POOL_ADDRESS_RE = re.compile(r"0x[0-9a-fA-F]{40}(?:[0-9a-fA-F]{24})?")
 
 
 class RankingMetric(str, Enum):
@@ -53,6 +57,15 @@ class ReportRequest(BaseModel):
             obj["pool_addresses"] = [obj.pop("pool_address")]
         return super().model_validate(obj)
     
+    @field_validator('pool_addresses')
+    @classmethod
+    def check_pool_addresses(cls, pool_addresses):
+        """Reject malformed pool addresses before any API call is made."""
+        for address in pool_addresses or []:
+            if not _POOL_ADDRESS_RE.fullmatch(address):
+                raise ValueError(f"Invalid pool address: {address}")
+        return pool_addresses
+    
     @model_validator(mode='after')
     def check_pools_or_user(self):
         """Ensure either pool_addresses or user_id is provided."""
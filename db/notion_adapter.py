@@ -4,7 +4,7 @@ Notion Database Adapter - Provides SQLAlchemy-like interface using Notion API.
 This module mimics the SQLAlchemy models and query interface to allow
 existing code to work with Notion instead of Supabase.
 """
-from typing import List, Optional, Any
+from typing import Any, Callable, Dict, List, Optional
 from services.notion import (
     get_whitelist_data,
     get_all_clients,
@@ -161,11 +161,34 @@ def _extract_filter_field_and_value(condition):
     return field_name, value
 
 
+def _matching(item: Any | None, field_name: str, value: Any) -> List[Any]:
+    """Wrap an indexed lookup result as a filter result (exact equality, like filter())."""
+    return [item] if item is not None and getattr(item, field_name, None) == value else []
+
+
 class NotionQuery:
     """Mimics SQLAlchemy query interface for filtering."""
     
-    def __init__(self, data: List[Any]):
-        self.data = data
+    def __init__(
+        self,
+        data: List[Any] | Callable[[], List[Any]],
+        lookups: Dict[str, Callable[[Any], List[Any]]] | None = None
+    ):
+        """
+        Args:
+            data: Rows, or a loader called the first time all rows are needed
+            lookups: Per-field functions returning the rows equal to a value,
+                used instead of loading and scanning every row
+        """
+        self._data = data
+        self._lookups = lookups or {}
+    
+    @property
+    def data(self) -> List[Any]:
+        """Rows matched so far (loaded on first access)."""
+        if callable(self._data):
+            self._data = self._data()
+        return self._data
     
     def filter(self, *conditions) -> 'NotionQuery':
         """Filter data based on conditions."""
@@ -173,7 +196,11 @@ class NotionQuery:
             if hasattr(condition, 'left') and hasattr(condition, 'right'):
                 field_name, value = _extract_filter_field_and_value(condition)
                 if field_name and value is not None:
-                    self.data = [item for item in self.data if getattr(item, field_name, None) == value]
+                    if callable(self._data) and field_name in self._lookups:
+                        # Indexed lookup: nothing loaded yet, so skip the full scan
+                        self._data = self._lookups[field_name](value)
+                    else:
+                        self._data = [item for item in self.data if getattr(item, field_name, None) == value]
         return self
     
     def first(self) -> Any | None:
@@ -195,12 +222,16 @@ class NotionSession:
     def query(self, model_class) -> NotionQuery:
         """Create a query for the given model class."""
         if model_class == NotionAllowedUser:
-            users_data = get_whitelist_data()
-            users = [NotionAllowedUser(user.get("user_id"), user.get("username")) for user in users_data]
-            return NotionQuery(users)
+            return NotionQuery(
+                lambda: [NotionAllowedUser(user.get("user_id"), user.get("username")) for user in get_whitelist_data()],
+                lookups={"user_id": lambda user_id: _matching(NotionAllowedUser.find_by_user_id(user_id), "user_id", user_id)}
+            )
         
         elif model_class == NotionClient:
-            return NotionQuery(NotionClient.get_all())
+            return NotionQuery(
+                NotionClient.get_all,
+                lookups={"client_key": lambda client_key: _matching(NotionClient.find_by_key(client_key), "client_key", client_key)}
+            )
         
         elif model_class == NotionClientPool:
             clients = NotionClient.get_all()
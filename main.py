@@ -8,14 +8,23 @@ from datetime import datetime
 from contextlib import asynccontextmanager
 import httpx
 import asyncio
+import logging
 
 from models import ReportRequest, ReportResponse, HealthResponse
 from services.metrics_calculator import MetricsCalculator
 from services.email_sender import EmailSender, EmailSenderError
-from services.balancer_api import BalancerAPIError
-from services.telegram_sender import TelegramSender
+from services.balancer_api import BalancerAPIError, close_http_client
+from services.snapshot_cache import close_snapshot_cache
+from services.card_renderer import close_browser, warmup as warmup_card_renderer
+from services.telegram_sender import TelegramSender, close_telegram_client
 from config import settings
 from db.notion_adapter import get_notion_db, NotionAllowedUser, NotionClient, NotionClientPool
+from services.notion import prefetch_all
+
+logging.basicConfig(
+    level=settings.log_level.upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
 
 
 # Lifespan context manager for startup/shutdown events
@@ -24,9 +33,17 @@ async def lifespan(app: FastAPI):
     """Lifespan context manager for the FastAPI app."""
     # Startup
     print("🚀 Starting Balancer Pool Reporter API...")
+    if settings.notion_api_key:
+        await prefetch_all()
+    if settings.telegram_bot_token:
+        await warmup_card_renderer()
     yield
     # Shutdown
     print("👋 Shutting down Balancer Pool Reporter API...")
+    await close_http_client()
+    close_snapshot_cache()
+    await close_browser()
+    await close_telegram_client()
 
 
 # Initialize FastAPI app
@@ -151,8 +168,10 @@ async def telegram_webhook(request: Request, db = Depends(get_notion_db)):
                         blockchain = pool_obj.blockchain
                         version = pool_obj.version
                         
-                        metrics = await calculator.calculate_pool_metrics(pool_address, blockchain=blockchain)
-                        pool_data = await calculator.api.get_current_pool_data(pool_address, blockchain=blockchain)
+                        metrics, pool_data = await asyncio.gather(
+                            calculator.calculate_pool_metrics(pool_address, blockchain=blockchain),
+                            calculator.api.get_current_pool_data(pool_address, blockchain=blockchain)
+                        )
                         
                         # Override blockchain/version from pool object if available
                         if blockchain:
@@ -167,11 +186,9 @@ async def telegram_webhook(request: Request, db = Depends(get_notion_db)):
                         blockchain_final = pool_data.get("_blockchain", blockchain or "ethereum")
                         version_final = pool_data.get("_api_version", version or "v2")
                         pool_url_link = pool_obj.url or f"https://balancer.fi/pools/{blockchain_final}/{version_final}/{pool_id}"
-                        current_time = datetime.utcnow().strftime("%B %d, %Y at %H:%M UTC")
 
                         metrics_data["pool_id"] = pool_id
                         metrics_data["pool_url"] = pool_url_link
-                        metrics_data["timestamp"] = current_time
 
                         await telegram_sender.send_pool_report(
                             pool_data=pool_data,
@@ -403,12 +420,13 @@ async def generate_report(request: ReportRequest):
             # ---------------------------------------------------------
             pool_address = pool_addresses[0]
 
-            metrics = await calculator.calculate_pool_metrics(pool_address)
-            
-            # Get pool data for token info
-            pool_data = await calculator.api.get_current_pool_data(pool_address)
+            # Fetch metrics and pool data (for token info) concurrently
+            metrics, pool_data = await asyncio.gather(
+                calculator.calculate_pool_metrics(pool_address),
+                calculator.api.get_current_pool_data(pool_address)
+            )
             
-            # Format metrics dictionary
+            # Format metrics dictionary (includes the report timestamp)
             metrics_data = calculator.format_metrics_for_email(metrics, pool_data)
 
             # Extract Metadata
@@ -416,14 +434,12 @@ async def generate_report(request: ReportRequest):
             blockchain = pool_data.get("_blockchain", "ethereum")
             version = pool_data.get("_api_version", "v2")
             
-            # Construct URL and Timestamp
+            # Construct URL
             pool_url_link = f"https://balancer.fi/pools/{blockchain}/{version}/{pool_id}"
-            current_time = datetime.utcnow().strftime("%B %d, %Y at %H:%M UTC")
             
             # Inject data for the Telegram Card & Markdown
             metrics_data["pool_id"] = pool_id
             metrics_data["pool_url"] = pool_url_link
-            metrics_data["timestamp"] = current_time
             
             # Send email
             if request.recipient_email and email_sender.enabled:
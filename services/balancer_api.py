@@ -2,15 +2,329 @@
 Balancer API service for querying pool data via GraphQL.
 Handles both V3 API and V2 Subgraph queries.
 """
+import asyncio
+import hashlib
+import logging
+import math
+import time
 import httpx
-from datetime import datetime, timedelta
+import orjson
+from itertools import accumulate
 from typing import Any, Dict, List
 from config import settings
+from services.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
 
 
 class BalancerAPIError(Exception):
     """Custom exception for Balancer API errors."""
-    pass
+    
+    def __init__(self, message: str, errors: List[Dict[str, Any]] | None = None):
+        """
+        Args:
+            message: Error description
+            errors: Optional raw GraphQL error objects, joined into the message lazily
+        """
+        super().__init__(message)
+        self.message = message
+        self.errors = errors
+    
+    def __str__(self) -> str:
+        if not self.errors:
+            return self.message
+        return f"{self.message}: {', '.join(e.get('message', str(e)) for e in self.errors)}"
+
+
+# Shared HTTP client so every query reuses pooled keep-alive connections
+# instead of paying a fresh TCP + TLS handshake per request.
+_http_client: httpx.AsyncClient | None = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client, creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        # httpx advertises every decoder it has installed in Accept-Encoding
+        # (gzip/deflate always, br and zstd via the extras in requirements.txt)
+        # and decompresses responses transparently.
+        _http_client = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            http2=True
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client (called on application shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# Blockchain names (as used in balancer.fi URLs) to V3 API chain codes
+_CHAIN_MAP: Dict[str, str] = {
+    "ethereum": "MAINNET",
+    "arbitrum": "ARBITRUM",
+    "polygon": "POLYGON",
+    "base": "BASE",
+    "gnosis": "GNOSIS",
+    "optimism": "OPTIMISM",
+    "avalanche": "AVALANCHE",
+    "zkevm": "ZKEVM",
+    "mode": "MODE",
+    "fraxtal": "FRAXTAL",
+    "plasma": "PLASMA",
+}
+
+# V3 snapshot ranges (GqlPoolSnapshotDataRange) by the number of days they cover
+_V3_SNAPSHOT_RANGES = (
+    (30, "THIRTY_DAYS"),
+    (90, "NINETY_DAYS"),
+    (180, "ONE_HUNDRED_EIGHTY_DAYS"),
+    (365, "ONE_YEAR"),
+)
+
+# Shared result for queries that return no data; treat as read-only
+_EMPTY_DICT: Dict[str, Any] = {}
+
+# Request bodies are pre-encoded with orjson, so the content type is set explicitly
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Pool metadata only changes on block cadence and daily snapshots rarely change,
+# so both are cached process-wide (BalancerAPI is instantiated per request).
+_pool_cache = TTLCache(ttl=60)
+_snapshot_cache = TTLCache(ttl=300)
+
+# API version ("v2"/"v3") of recently resolved pools, keyed by (address, chain).
+# A pool's version never changes, so the TTL is long; the size cap keeps arbitrary
+# user-supplied addresses from accumulating forever
+_pool_versions = TTLCache(ttl=86400, maxsize=1024)
+
+# Identical queries already on the wire, so concurrent callers share one request
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+# GraphQL query used to look up a pool in the V3 API
+_V3_GET_POOL_QUERY = """
+query GetPool($id: String!, $chain: GqlChain!) {
+  poolGetPool(id: $id, chain: $chain) {
+    id
+    address
+    name
+    type
+    version
+    dynamicData {
+      totalLiquidity
+      volume24h
+      fees24h
+      swapFee
+      aprItems {
+        title
+        apr
+        type
+      }
+    }
+    allTokens {
+      address
+      symbol
+      weight
+    }
+  }
+}
+"""
+
+# GraphQL query used to look up a pool in the V2 subgraph by address
+_V2_POOL_BY_ADDRESS_QUERY = """
+query PoolByAddress($address: Bytes!) {
+  pools(first: 1, where: { address: $address }) {
+    id
+    address
+    name
+    poolType
+    swapFee
+    totalLiquidity
+    tokens {
+      address
+      symbol
+      weight
+    }
+  }
+}
+"""
+
+# Fields selected from V3 snapshots (shared by the single and batched queries)
+_V3_SNAPSHOT_FIELDS = "timestamp totalLiquidity volume24h fees24h"
+
+# V3 API historical snapshots query (range is a GqlPoolSnapshotDataRange enum)
+_V3_SNAPSHOTS_QUERY = f"""
+query GetPoolSnapshots($id: String!, $chain: GqlChain!, $range: GqlPoolSnapshotDataRange!) {{
+  poolGetSnapshots(id: $id, chain: $chain, range: $range) {{ {_V3_SNAPSHOT_FIELDS} }}
+}}
+"""
+
+# V2 subgraph snapshot queries, filtered by pool address (nested) or full pool ID
+_V2_SNAPSHOTS_BY_ADDRESS_QUERY = """
+query GetPoolSnapshots($address: Bytes!, $timestamp: Int!) {
+  poolSnapshots(
+    first: 1000
+    orderBy: timestamp
+    orderDirection: asc
+    where: {
+      pool_: { address: $address }
+      timestamp_gte: $timestamp
+    }
+  ) {
+    timestamp
+    liquidity
+    swapVolume
+    swapFees
+  }
+}
+"""
+
+_V2_SNAPSHOTS_BY_ID_QUERY = """
+query GetPoolSnapshots($poolId: String!, $timestamp: Int!) {
+  poolSnapshots(
+    first: 1000
+    orderBy: timestamp
+    orderDirection: asc
+    where: {
+      pool: $poolId
+      timestamp_gte: $timestamp
+    }
+  ) {
+    timestamp
+    liquidity
+    swapVolume
+    swapFees
+  }
+}
+"""
+
+# V2 subgraph queries for the few snapshots inside a narrow time window
+_V2_SNAPSHOTS_IN_RANGE_BY_ADDRESS_QUERY = """
+query GetPoolSnapshotsInRange($address: Bytes!, $start: Int!, $end: Int!) {
+  poolSnapshots(
+    first: 10
+    orderBy: timestamp
+    orderDirection: asc
+    where: {
+      pool_: { address: $address }
+      timestamp_gte: $start
+      timestamp_lte: $end
+    }
+  ) {
+    timestamp
+    liquidity
+    swapVolume
+    swapFees
+  }
+}
+"""
+
+_V2_SNAPSHOTS_IN_RANGE_BY_ID_QUERY = """
+query GetPoolSnapshotsInRange($poolId: String!, $start: Int!, $end: Int!) {
+  poolSnapshots(
+    first: 10
+    orderBy: timestamp
+    orderDirection: asc
+    where: {
+      pool: $poolId
+      timestamp_gte: $start
+      timestamp_lte: $end
+    }
+  ) {
+    timestamp
+    liquidity
+    swapVolume
+    swapFees
+  }
+}
+"""
+
+# V2 subgraph swaps for a pool within a time range
+_V2_SWAPS_QUERY = """
+query GetPoolSwaps($poolId: String!, $startTime: Int!, $endTime: Int!) {
+  swaps(
+    first: 1000
+    orderBy: timestamp
+    orderDirection: asc
+    where: {
+      poolId: $poolId
+      timestamp_gte: $startTime
+      timestamp_lte: $endTime
+    }
+  ) {
+    id
+    timestamp
+    tokenIn
+    tokenOut
+    tokenAmountIn
+    tokenAmountOut
+    valueUSD
+  }
+}
+"""
+
+
+def _norm_addr(address: str) -> str:
+    """Return the canonical lower-case form of a pool address or ID."""
+    return address if address.islower() else address.lower()
+
+
+def _v3_snapshot_range(days_back: int) -> str:
+    """Smallest V3 API snapshot range that still covers days_back."""
+    return next(
+        (name for days, name in _V3_SNAPSHOT_RANGES if days_back <= days),
+        "ALL_TIME"
+    )
+
+
+def _normalize_v3_snapshots(snapshots: List[Dict[str, Any]], start_timestamp: int) -> List[Dict[str, Any]]:
+    """
+    Convert raw V3 snapshots to the V2 format, keeping those since start_timestamp.
+    
+    Args:
+        snapshots: Snapshots as returned by poolGetSnapshots
+        start_timestamp: Earliest timestamp to keep
+        
+    Returns:
+        Snapshots in ascending timestamp order with cumulative volume and fees
+    """
+    in_range = [s for s in snapshots if int(s.get("timestamp", 0)) >= start_timestamp]
+    # Ascending order is required for the running totals (and by callers)
+    in_range.sort(key=lambda s: int(s.get("timestamp", 0)))
+    
+    # Running totals turn V3's daily volume/fees into V2-style cumulative values
+    cumulative_volumes = accumulate(float(s.get("volume24h", 0)) for s in in_range)
+    cumulative_fees = accumulate(float(s.get("fees24h", 0)) for s in in_range)
+    
+    return [
+        {
+            "timestamp": int(snapshot.get("timestamp", 0)),
+            "liquidity": snapshot.get("totalLiquidity", "0"),
+            "swapVolume": str(volume),
+            "swapFees": str(fees),
+            "swapsCount": 0
+        }
+        for snapshot, volume, fees in zip(in_range, cumulative_volumes, cumulative_fees)
+    ]
+
+
+def _v3_snapshots_batch_query(count: int) -> str:
+    """Build one query fetching V3 snapshots for count pools, aliased p0..p{count-1}."""
+    id_variables = "".join(f", $id{i}: String!" for i in range(count))
+    fields = "".join(
+        f"  p{i}: poolGetSnapshots(id: $id{i}, chain: $chain, range: $range) {{ {_V3_SNAPSHOT_FIELDS} }}\n"
+        for i in range(count)
+    )
+    return (
+        f"query GetPoolSnapshotsBatch($chain: GqlChain!, $range: GqlPoolSnapshotDataRange!{id_variables}) {{\n"
+        f"{fields}}}"
+    )
 
 
 class BalancerAPI:
@@ -24,7 +338,7 @@ class BalancerAPI:
         self.blockchain_name = settings.blockchain_name  # For balancer.fi URLs (e.g., ethereum)
         
         if self.gql_endpoint:
-            print(f"🔗 Using Balancer GQL Endpoint: {self.gql_endpoint}")
+            logger.debug("🔗 Using Balancer GQL Endpoint: %s", self.gql_endpoint)
     
     async def _execute_query(
         self,
@@ -34,6 +348,9 @@ class BalancerAPI:
     ) -> Dict[str, Any]:
         """
         Execute a GraphQL query against the specified endpoint.
+        Concurrent calls with the same query and variables share one request,
+        and therefore the same result object: treat it as read-only and copy
+        anything that needs modifying.
         
         Args:
             url: GraphQL endpoint URL
@@ -46,26 +363,67 @@ class BalancerAPI:
         Raises:
             BalancerAPIError: If the query fails
         """
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                response = await client.post(
-                    url,
-                    json={"query": query, "variables": variables or {}}
-                )
-                response.raise_for_status()
-                
-                result = response.json()
-                
-                if "errors" in result:
-                    error_messages = [e.get("message", str(e)) for e in result["errors"]]
-                    raise BalancerAPIError(f"GraphQL errors: {', '.join(error_messages)}")
-                
-                return result.get("data", {})
-                
-            except httpx.HTTPError as e:
-                raise BalancerAPIError(f"HTTP error querying Balancer API: {str(e)}")
-            except Exception as e:
-                raise BalancerAPIError(f"Error querying Balancer API: {str(e)}")
+        variables = variables or {}
+        key = hashlib.blake2b(
+            (url + query).encode() + orjson.dumps(variables, option=orjson.OPT_SORT_KEYS),
+            digest_size=16
+        ).hexdigest()
+        
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._post_query(url, query, variables))
+            _inflight[key] = task
+            task.add_done_callback(lambda _: _inflight.pop(key, None))
+        
+        # Shield so one caller being cancelled doesn't cancel the shared request
+        return await asyncio.shield(task)
+    
+    async def _post_query(
+        self,
+        url: str,
+        query: str,
+        variables: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        POST a single GraphQL query and return its data.
+        
+        Args:
+            url: GraphQL endpoint URL
+            query: GraphQL query string
+            variables: Query variables
+            
+        Returns:
+            Query response data
+            
+        Raises:
+            BalancerAPIError: If the query fails
+        """
+        try:
+            response = await _get_http_client().post(
+                url,
+                content=orjson.dumps({"query": query, "variables": variables}),
+                headers=_JSON_HEADERS
+            )
+            response.raise_for_status()
+            
+            result = orjson.loads(response.content)
+            
+            if "errors" in result:
+                raise BalancerAPIError("GraphQL errors", result["errors"])
+            
+            data = result.get("data")
+            return data if data is not None else _EMPTY_DICT
+            
+        except BalancerAPIError:
+            raise
+        except httpx.HTTPError as e:
+            raise BalancerAPIError(f"HTTP error querying Balancer API: {str(e)}")
+        except Exception as e:
+            raise BalancerAPIError(f"Error querying Balancer API: {str(e)}")
+    
+    async def aclose(self) -> None:
+        """Close the shared HTTP client used by all BalancerAPI instances."""
+        await close_http_client()
     
     def _blockchain_name_to_api_chain(self, blockchain_name: str) -> str:
         """
@@ -78,25 +436,37 @@ class BalancerAPI:
             base -> BASE
             plasma -> PLASMA
         """
-        mapping = {
-            "ethereum": "MAINNET",
-            "arbitrum": "ARBITRUM",
-            "polygon": "POLYGON",
-            "base": "BASE",
-            "gnosis": "GNOSIS",
-            "optimism": "OPTIMISM",
-            "avalanche": "AVALANCHE",
-            "zkevm": "ZKEVM",
-            "mode": "MODE",
-            "fraxtal": "FRAXTAL",
-            "plasma": "PLASMA",
-        }
-        return mapping.get(blockchain_name.lower(), blockchain_name.upper())
+        return _CHAIN_MAP.get(blockchain_name.lower()) or blockchain_name.upper()
+    
+    def _queries_v2(self, blockchain: str | None) -> bool:
+        """Whether pool lookups on this chain also probe the V2 subgraph."""
+        return bool(self.gql_endpoint) and (not blockchain or blockchain.lower() == "ethereum")
+    
+    def known_pool_version(self, pool_address: str, blockchain: str | None = None) -> str | None:
+        """
+        Return a pool's API version if it can be known without querying.
+        
+        Pools are always V3 when the V2 subgraph is not probed (no GQL endpoint, or
+        a non-Ethereum chain); otherwise the version seen by an earlier lookup is used.
+        
+        Args:
+            pool_address: Pool address
+            blockchain: Optional blockchain name (e.g., "ethereum", "arbitrum", "plasma")
+            
+        Returns:
+            "v2" or "v3", or None if the pool has to be looked up first
+        """
+        if not self._queries_v2(blockchain):
+            return "v3"
+        
+        api_chain = self._blockchain_name_to_api_chain(blockchain) if blockchain else self.chain
+        return _pool_versions.get((_norm_addr(pool_address), api_chain))
     
     async def get_current_pool_data(self, pool_address: str, blockchain: str | None = None) -> Dict[str, Any]:
         """
         Get current pool data from Balancer GraphQL endpoint.
         Supports both V2 (via subgraph) and V3 (via API) automatically.
+        Results are cached for 60 seconds per (address, chain).
         
         Args:
             pool_address: Ethereum address of the pool (42 chars)
@@ -106,6 +476,7 @@ class BalancerAPI:
         Returns:
             Dictionary containing pool data
         """
+        pool_address = _norm_addr(pool_address)
         # Determine which chain to use
         if blockchain:
             api_chain = self._blockchain_name_to_api_chain(blockchain)
@@ -114,77 +485,100 @@ class BalancerAPI:
             api_chain = self.chain
             blockchain_name = self.blockchain_name
         
-        print(f"🔍 Querying pool {pool_address} on chain: {api_chain} ({blockchain_name})")
+        cache_key = (pool_address, api_chain)
+        cached = _pool_cache.get(cache_key)
+        if cached is not None:
+            logger.debug("✅ Using cached pool data for %s (%s)", pool_address, api_chain)
+            # Callers tag the returned dict, so hand out a copy
+            return dict(cached)
+        
+        logger.debug("🔍 Querying pool %s on chain: %s (%s)", pool_address, api_chain, blockchain_name)
         
         # Note: V2 subgraph is typically Ethereum-only, so skip if querying other chains
-        if self.gql_endpoint and (not blockchain or blockchain.lower() == "ethereum"):
-            print(f"🔍 Querying V2 subgraph by address: {pool_address}")
-            try:
-                pool = await self._get_v2_pool_by_address(pool_address)
-                if pool:
-                    print(f"✅ Found V2 pool: {pool.get('name', pool.get('id'))}")
-                    pool['_blockchain'] = blockchain_name
-                    return pool
-                else:
-                    print(f"⚠️  Pool not found in V2 subgraph for address: {pool_address}")
-            except Exception as e:
-                print(f"⚠️  V2 query error for {pool_address}: {str(e)}")
-        elif blockchain and blockchain.lower() != "ethereum":
-            print(f"⏭️  Skipping V2 subgraph (only supports Ethereum, querying {blockchain})")
-        
-        # Try V3 API format
+        query_v2 = self._queries_v2(blockchain)
+        if blockchain and blockchain.lower() != "ethereum":
+            logger.debug("⏭️  Skipping V2 subgraph (only supports Ethereum, querying %s)", blockchain)
+        
+        # Probe V2 and V3 concurrently; a V2 match takes precedence as before
+        if query_v2:
+            v2_pool, v3_pool = await asyncio.gather(
+                self._find_v2_pool(pool_address, blockchain_name),
+                self._find_v3_pool(pool_address, api_chain, blockchain_name)
+            )
+        else:
+            v2_pool, v3_pool = None, await self._find_v3_pool(pool_address, api_chain, blockchain_name)
+        
+        pool = v2_pool or v3_pool
+        if pool:
+            _pool_cache.set(cache_key, pool)
+            _pool_versions.set(cache_key, pool.get("_api_version", "v2"))
+            return dict(pool)
+        
+        raise BalancerAPIError(
+            f"Pool not found: {pool_address} on chain {api_chain}. "
+            f"Tried both V2 subgraph and V3 API."
+        )
+    
+    async def _find_v2_pool(self, pool_address: str, blockchain_name: str) -> Dict[str, Any] | None:
+        """
+        Look up a pool in the V2 subgraph, returning None if missing or on error.
+        
+        Args:
+            pool_address: Pool address (42 chars)
+            blockchain_name: Blockchain name for balancer.fi URLs
+            
+        Returns:
+            Normalized pool data or None
+        """
+        logger.debug("🔍 Querying V2 subgraph by address: %s", pool_address)
         try:
-            query = """
-            query GetPool($id: String!, $chain: GqlChain!) {
-              poolGetPool(id: $id, chain: $chain) {
-                id
-                address
-                name
-                type
-                version
-                dynamicData {
-                  totalLiquidity
-                  volume24h
-                  fees24h
-                  swapFee
-                  aprItems {
-                    id
-                    title
-                    apr
-                    type
-                  }
-                }
-                allTokens {
-                  address
-                  symbol
-                  name
-                  weight
-                }
-              }
-            }
-            """
+            pool = await self._get_v2_pool_by_address(pool_address)
+            if pool:
+                logger.info("✅ Found V2 pool: %s", pool.get('name', pool.get('id')))
+                pool['_blockchain'] = blockchain_name
+                return pool
+            logger.warning("⚠️  Pool not found in V2 subgraph for address: %s", pool_address)
+        except Exception as e:
+            logger.warning("⚠️  V2 query error for %s: %s", pool_address, e)
+        return None
+    
+    async def _find_v3_pool(
+        self,
+        pool_address: str,
+        api_chain: str,
+        blockchain_name: str
+    ) -> Dict[str, Any] | None:
+        """
+        Look up a pool in the V3 API, returning None if missing or on error.
+        
+        Args:
+            pool_address: Pool address (42 chars)
+            api_chain: API chain code (e.g., MAINNET)
+            blockchain_name: Blockchain name for balancer.fi URLs
             
+        Returns:
+            Pool data or None
+        """
+        try:
             variables = {
-                "id": pool_address.lower(),
+                "id": pool_address,
                 "chain": api_chain
             }
             
-            data = await self._execute_query(self.v3_api_url, query, variables)
-            pool = data.get("poolGetPool")
-            
-            if pool:
-                print(f"✅ Found V3 pool: {pool.get('name')}")
-                # Add metadata for URL generation
-                pool['_api_version'] = 'v3'
-                pool['_blockchain'] = blockchain_name
-                return pool
+            data = await self._execute_query(self.v3_api_url, _V3_GET_POOL_QUERY, variables)
+            return self._tag_v3_pool(data.get("poolGetPool"), blockchain_name)
         except Exception as e:
-            print(f"⚠️  V3 API failed: {str(e)}")
-        
-        raise BalancerAPIError(
-            f"Pool not found: {pool_address} on chain {api_chain}. "
-            f"Tried both V2 subgraph and V3 API."
-        )
+            logger.warning("⚠️  V3 API failed: %s", e)
+        return None
+    
+    def _tag_v3_pool(self, pool: Dict[str, Any] | None, blockchain_name: str) -> Dict[str, Any] | None:
+        """Return a copy of a V3 pool result with URL-generation metadata (None passes through)."""
+        if pool:
+            logger.info("✅ Found V3 pool: %s", pool.get('name'))
+            # Copy first: the query result is shared with every coalesced caller,
+            # which may be tagging the same pool for another blockchain
+            pool = {**pool, '_api_version': 'v3', '_blockchain': blockchain_name}
+        return pool
     
     async def _get_v2_pool_by_address(self, pool_address: str) -> Dict[str, Any] | None:
         """
@@ -196,41 +590,37 @@ class BalancerAPI:
         Returns:
             Pool data in normalized format
         """
-        query = """
-        query PoolByAddress($address: Bytes!) {
-          pools(first: 1, where: { address: $address }) {
-            id
-            address
-            name
-            poolType
-            swapFee
-            totalLiquidity
-            totalSwapVolume
-            totalSwapFee
-            tokens {
-              address
-              symbol
-              name
-              decimals
-              balance
-              weight
-            }
-          }
-        }
-        """
+        pool_address = _norm_addr(pool_address)
+        cache_key = (pool_address, "v2")
+        cached = _pool_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
         
         variables = {
-            "address": pool_address.lower()
+            "address": pool_address
         }
         
-        data = await self._execute_query(self.v2_subgraph_url, query, variables)
+        data = await self._execute_query(self.v2_subgraph_url, _V2_POOL_BY_ADDRESS_QUERY, variables)
         pools = data.get("pools", [])
         
         if not pools:
             return None
         
-        v2_pool = pools[0]
+        pool = self._normalize_v2_pool(pools[0], pool_address)
+        _pool_cache.set(cache_key, pool)
+        return dict(pool)
+    
+    def _normalize_v2_pool(self, v2_pool: Dict[str, Any], pool_address: str) -> Dict[str, Any]:
+        """
+        Normalize a V2 subgraph pool to match the V3 API format.
         
+        Args:
+            v2_pool: Raw pool from the V2 subgraph
+            pool_address: Pool address used for the lookup
+            
+        Returns:
+            Pool data in normalized format
+        """
         # Normalize V2 data to match V3 format for compatibility
         return {
             "id": v2_pool.get("id"),
@@ -274,9 +664,9 @@ class BalancerAPI:
         Returns:
             List of pool snapshots with timestamp, liquidity, volume, and fees
         """
+        pool_address = _norm_addr(pool_address)
         # Calculate timestamp range
-        end_timestamp = int(datetime.utcnow().timestamp())
-        start_timestamp = int((datetime.utcnow() - timedelta(days=days_back)).timestamp())
+        start_timestamp = int(time.time()) - days_back * 86400
         
         # Determine which chain to use
         if blockchain:
@@ -284,73 +674,41 @@ class BalancerAPI:
         else:
             api_chain = self.chain
         
-        query = """
-        query GetPoolSnapshots($id: String!, $chain: GqlChain!, $range: GqlPoolSnapshotDataRange!) {
-          poolGetSnapshots(id: $id, chain: $chain, range: $range) {
-            timestamp
-            totalLiquidity
-            volume24h
-            fees24h
-            sharePrice
-          }
-        }
-        """
-        
-        # Determine which chain to use
-        if blockchain:
-            api_chain = self._blockchain_name_to_api_chain(blockchain)
-        else:
-            api_chain = self.chain
+        # Smallest server-side range that still covers days_back
+        snapshot_range = _v3_snapshot_range(days_back)
         
         variables = {
-            "id": pool_address.lower(),
+            "id": pool_address,
             "chain": api_chain,
-            "range": "THIRTY_DAYS"
+            "range": snapshot_range
         }
         
         try:
-            print(f"   Attempting V3 snapshot query with range: THIRTY_DAYS")
-            print(f"   Query variables: id={pool_address.lower()}, chain={api_chain}")
-            data = await self._execute_query(self.v3_api_url, query, variables)
+            logger.debug("   Attempting V3 snapshot query with range: %s", snapshot_range)
+            logger.debug("   Query variables: id=%s, chain=%s", pool_address, api_chain)
+            data = await self._execute_query(self.v3_api_url, _V3_SNAPSHOTS_QUERY, variables)
             snapshots = data.get("poolGetSnapshots", [])
             
             if not snapshots:
-                print(f"⚠️  No snapshots returned from V3 API (empty result)")
+                logger.warning("⚠️  No snapshots returned from V3 API (empty result)")
                 return []
             
-            # Normalize V3 snapshots to match V2 format
-            normalized_snapshots = []
-            cumulative_volume = 0
-            cumulative_fees = 0
-            
-            for snapshot in snapshots:
-                timestamp = int(snapshot.get("timestamp", 0))
-                if timestamp >= start_timestamp:
-                    cumulative_volume += float(snapshot.get("volume24h", 0))
-                    cumulative_fees += float(snapshot.get("fees24h", 0))
-                    
-                    normalized_snapshots.append({
-                        "timestamp": timestamp,
-                        "liquidity": snapshot.get("totalLiquidity", "0"),
-                        "swapVolume": str(cumulative_volume),
-                        "swapFees": str(cumulative_fees),
-                        "swapsCount": 0
-                    })
+            normalized_snapshots = _normalize_v3_snapshots(snapshots, start_timestamp)
             
-            print(f"✅ Got {len(normalized_snapshots)} V3 snapshots")
+            logger.info("✅ Got %s V3 snapshots", len(normalized_snapshots))
             return normalized_snapshots
             
         except BalancerAPIError as e:
             error_msg = str(e)
-            print(f"⚠️  V3 snapshots query failed: {error_msg}")
+            logger.warning("⚠️  V3 snapshots query failed: %s", error_msg)
             if "GraphQL errors" in error_msg:
-                print(f"   GraphQL Error Details: {error_msg}")
-            print(f"   V3 historical snapshots may not be available through this API endpoint yet")
-            print(f"   Falling back to estimated metrics based on 24h data")
+                logger.debug("   GraphQL Error Details: %s", error_msg)
+            logger.warning("   V3 historical snapshots may not be available through this API endpoint yet")
+            logger.warning("   Falling back to estimated metrics based on 24h data")
             return []
         except Exception as e:
-            print(f"⚠️  Unexpected error in V3 snapshots: {str(e)}")
-            print(f"   Falling back to estimated metrics based on 24h data")
+            logger.warning("⚠️  Unexpected error in V3 snapshots: %s", e)
+            logger.warning("   Falling back to estimated metrics based on 24h data")
             return []
     
     async def get_pool_snapshots(
@@ -361,7 +719,8 @@ class BalancerAPI:
         blockchain: str | None = None
     ) -> List[Dict[str, Any]]:
         """
-        Get historical pool snapshots from Balancer API (V2 or V3).
+        Get historical pool snapshots from Balancer API (V2 or V3), ordered by
+        ascending timestamp. Non-empty results are cached for 5 minutes.
         
         Args:
             pool_address: Pool address or full pool ID
@@ -372,64 +731,145 @@ class BalancerAPI:
         Returns:
             List of pool snapshots with timestamp, liquidity, volume, and fees
         """
-        if pool_version == "v3":
-            print(f"🔍 Fetching V3 snapshots for {pool_address}")
-            return await self.get_v3_pool_snapshots(pool_address, days_back, blockchain=blockchain)
-        
-
-        pool_id = pool_address
-        
-        if len(pool_address) == 42 and self.gql_endpoint:
-            try:
-                pool_data = await self._get_v2_pool_by_address(pool_address)
-                if pool_data and pool_data.get("id"):
-                    pool_id = pool_data["id"]
-                    print(f"✅ Got full pool ID: {pool_id}")
-            except Exception as e:
-                print(f"⚠️  Could not get full pool ID: {str(e)}")
+        pool_address = _norm_addr(pool_address)
+        api_chain = self._blockchain_name_to_api_chain(blockchain) if blockchain else self.chain
+        cache_key = (pool_address, days_back, pool_version, api_chain)
+        cached = _snapshot_cache.get(cache_key)
+        if cached is not None:
+            logger.debug("✅ Using %s cached snapshots for %s", len(cached), pool_address)
+            return list(cached)
+        
+        snapshots = await self._fetch_pool_snapshots(pool_address, days_back, pool_version, blockchain)
+        # Empty results may come from a transient failure, so only cache hits
+        if snapshots:
+            _snapshot_cache.set(cache_key, snapshots)
+        return list(snapshots)
+    
+    async def get_pool_snapshots_batch(
+        self,
+        pool_addresses: List[str],
+        days_back: int = 30,
+        blockchain: str | None = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Get historical snapshots for several V3 pools with a single aliased GraphQL query.
+        Results are cached exactly like get_pool_snapshots(..., pool_version="v3"), so
+        later per-pool calls are served from the cache.
         
-        # Calculate timestamp for days_back
-        timestamp_cutoff = int(
-            (datetime.utcnow() - timedelta(days=days_back)).timestamp()
-        )
+        Pools not known to be V3 (see known_pool_version) are skipped; callers fall
+        back to get_pool_snapshots for any address missing from the result.
         
-        query = """
-        query GetPoolSnapshots($poolId: String!, $timestamp: Int!) {
-          poolSnapshots(
-            first: 1000
-            orderBy: timestamp
-            orderDirection: asc
-            where: {
-              pool: $poolId
-              timestamp_gte: $timestamp
-            }
-          ) {
-            id
-            timestamp
-            liquidity
-            swapVolume
-            swapFees
-            swapsCount
-          }
-        }
+        Args:
+            pool_addresses: Pool addresses
+            days_back: Number of days of historical data to fetch
+            blockchain: Optional blockchain name (e.g., "ethereum", "arbitrum", "plasma")
+            
+        Returns:
+            Mapping of lower-case pool address to its snapshots in ascending order
+        """
+        api_chain = self._blockchain_name_to_api_chain(blockchain) if blockchain else self.chain
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        missing = []
+        for pool_address in dict.fromkeys(_norm_addr(a) for a in pool_addresses):
+            if self.known_pool_version(pool_address, blockchain=blockchain) != "v3":
+                continue
+            cached = _snapshot_cache.get((pool_address, days_back, "v3", api_chain))
+            if cached is not None:
+                results[pool_address] = list(cached)
+            else:
+                missing.append(pool_address)
+        
+        if not missing:
+            return results
+        
+        variables: Dict[str, Any] = {"chain": api_chain, "range": _v3_snapshot_range(days_back)}
+        variables.update((f"id{i}", pool_address) for i, pool_address in enumerate(missing))
+        try:
+            logger.debug("🔍 Fetching V3 snapshots for %s pools in one query", len(missing))
+            data = await self._execute_query(
+                self.v3_api_url,
+                _v3_snapshots_batch_query(len(missing)),
+                variables
+            )
+        except BalancerAPIError as e:
+            logger.warning("⚠️  Batched V3 snapshots query failed, querying per pool: %s", e)
+            return results
+        
+        start_timestamp = int(time.time()) - days_back * 86400
+        for i, pool_address in enumerate(missing):
+            snapshots = _normalize_v3_snapshots(data.get(f"p{i}") or [], start_timestamp)
+            # Empty results may come from a transient failure, so only cache hits
+            if snapshots:
+                _snapshot_cache.set((pool_address, days_back, "v3", api_chain), snapshots)
+                results[pool_address] = list(snapshots)
+        
+        logger.info("✅ Got V3 snapshots for %s of %s pools in one query", len(results), len(pool_addresses))
+        return results
+    
+    async def _fetch_pool_snapshots(
+        self,
+        pool_address: str,
+        days_back: int,
+        pool_version: str | None,
+        blockchain: str | None
+    ) -> List[Dict[str, Any]]:
         """
+        Fetch historical pool snapshots from the network, bypassing the cache.
         
-        variables = {
-            "poolId": pool_id.lower(),
-            "timestamp": timestamp_cutoff
-        }
+        Args:
+            pool_address: Pool address or full pool ID
+            days_back: Number of days of historical data to fetch
+            pool_version: Pool version ("v2" or "v3"), auto-detected if None
+            blockchain: Optional blockchain name (e.g., "ethereum", "arbitrum", "plasma")
+            
+        Returns:
+            List of pool snapshots with timestamp, liquidity, volume, and fees
+        """
+        if pool_version == "v3":
+            logger.debug("🔍 Fetching V3 snapshots for %s", pool_address)
+            return await self.get_v3_pool_snapshots(pool_address, days_back, blockchain=blockchain)
         
-        data = await self._execute_query(self.v2_subgraph_url, query, variables)
+        # Calculate timestamp for days_back
+        timestamp_cutoff = int(time.time()) - days_back * 86400
         
-        snapshots = data.get("poolSnapshots", [])
+        snapshots = await self._query_v2_snapshots(pool_address, timestamp_cutoff)
         
         if not snapshots:
-            print(f"⚠️  No historical snapshots found for pool {pool_id}")
+            logger.warning("⚠️  No historical snapshots found for pool %s", pool_address)
         else:
-            print(f"✅ Found {len(snapshots)} snapshots")
+            logger.info("✅ Found %s snapshots", len(snapshots))
         
         return snapshots
     
+    async def _query_v2_snapshots(
+        self,
+        pool_address: str,
+        timestamp_cutoff: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Query V2 subgraph snapshots for a pool address (or full pool ID) since a timestamp.
+        
+        Bare addresses are matched through the nested pool filter, so no extra
+        round-trip is needed to resolve the full pool ID first.
+        
+        Args:
+            pool_address: Pool address (42 chars) or full pool ID (66 chars)
+            timestamp_cutoff: Earliest snapshot timestamp to include (Unix)
+            
+        Returns:
+            List of pool snapshots ordered by timestamp
+        """
+        if len(pool_address) == 42:
+            query = _V2_SNAPSHOTS_BY_ADDRESS_QUERY
+            variables = {"address": pool_address, "timestamp": timestamp_cutoff}
+        else:
+            query = _V2_SNAPSHOTS_BY_ID_QUERY
+            variables = {"poolId": pool_address, "timestamp": timestamp_cutoff}
+        
+        data = await self._execute_query(self.v2_subgraph_url, query, variables)
+        
+        return data.get("poolSnapshots", [])
+    
     async def get_pool_swaps(
         self,
         pool_address: str,
@@ -447,36 +887,14 @@ class BalancerAPI:
         Returns:
             List of swap events
         """
-        query = """
-        query GetPoolSwaps($poolId: String!, $startTime: Int!, $endTime: Int!) {
-          swaps(
-            first: 1000
-            orderBy: timestamp
-            orderDirection: asc
-            where: {
-              poolId: $poolId
-              timestamp_gte: $startTime
-              timestamp_lte: $endTime
-            }
-          ) {
-            id
-            timestamp
-            tokenIn
-            tokenOut
-            tokenAmountIn
-            tokenAmountOut
-            valueUSD
-          }
-        }
-        """
-        
+        pool_address = _norm_addr(pool_address)
         variables = {
-            "poolId": pool_address.lower(),
+            "poolId": pool_address,
             "startTime": start_timestamp,
             "endTime": end_timestamp
         }
         
-        data = await self._execute_query(self.v2_subgraph_url, query, variables)
+        data = await self._execute_query(self.v2_subgraph_url, _V2_SWAPS_QUERY, variables)
         
         return data.get("swaps", [])
     
@@ -499,32 +917,73 @@ class BalancerAPI:
         Returns:
             Pool snapshot data or None if not found
         """
-        # Get snapshots (will automatically use V2 or V3 based on pool_version)
-        # Fetch 5 days of data to ensure we capture the target timestamp
-        snapshots = await self.get_pool_snapshots(
-            pool_address, 
-            days_back=5,
+        pool_address = _norm_addr(pool_address)
+        # Only snapshots within 1 day of the target are candidates
+        snapshots = await self.get_snapshots_in_range(
+            pool_address,
+            target_timestamp - 86400,
+            target_timestamp + 86400,
             pool_version=pool_version,
             blockchain=blockchain
         )
         
         if not snapshots:
-            return None
-        
-        # Filter snapshots within 1 day of target
-        nearby_snapshots = [
-            s for s in snapshots
-            if abs(int(s.get("timestamp", 0)) - target_timestamp) <= 86400
-        ]
-        
-        if not nearby_snapshots:
             # No snapshots close enough, return None
             return None
         
         # Find the snapshot closest to target_timestamp
-        closest_snapshot = min(
-            nearby_snapshots,
+        return min(
+            snapshots,
             key=lambda s: abs(int(s.get("timestamp", 0)) - target_timestamp)
         )
+    
+    async def get_snapshots_in_range(
+        self,
+        pool_address: str,
+        t_start: int,
+        t_end: int,
+        pool_version: str | None = None,
+        blockchain: str | None = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the pool snapshots whose timestamps fall within [t_start, t_end].
+        
+        V2 pushes the window into the subgraph query so only a handful of rows
+        come back. The V3 API has no timestamp filter, so V3 snapshots are taken
+        from the (cached) 30-day history and filtered locally.
+        
+        Args:
+            pool_address: Pool address or full pool ID
+            t_start: Window start (Unix timestamp, inclusive)
+            t_end: Window end (Unix timestamp, inclusive)
+            pool_version: Pool version ("v2" or "v3"), auto-detected if None
+            blockchain: Optional blockchain name (e.g., "ethereum", "arbitrum", "plasma")
+            
+        Returns:
+            List of pool snapshots ordered by timestamp
+        """
+        pool_address = _norm_addr(pool_address)
+        if pool_version == "v3":
+            days_back = max(30, math.ceil((time.time() - t_start) / 86400))
+            snapshots = await self.get_pool_snapshots(
+                pool_address,
+                days_back=days_back,
+                pool_version=pool_version,
+                blockchain=blockchain
+            )
+            return [s for s in snapshots if t_start <= int(s.get("timestamp", 0)) <= t_end]
+        
+        if len(pool_address) == 42:
+            query = _V2_SNAPSHOTS_IN_RANGE_BY_ADDRESS_QUERY
+            variables = {"address": pool_address, "start": t_start, "end": t_end}
+        else:
+            query = _V2_SNAPSHOTS_IN_RANGE_BY_ID_QUERY
+            variables = {"poolId": pool_address, "start": t_start, "end": t_end}
+        
+        try:
+            data = await self._execute_query(self.v2_subgraph_url, query, variables)
+        except BalancerAPIError as e:
+            logger.warning("⚠️  Snapshot range query failed for %s: %s", pool_address, e)
+            return []
         
-        return closest_snapshot
+        return data.get("poolSnapshots", [])
@@ -0,0 +1,180 @@
+"""
+Headless Chromium renderer for Telegram report cards.
+
+A single browser process is launched on first use and kept running, and its
+pages are pooled, so each card only pays for loading its HTML instead of a
+full Chromium cold start.
+"""
+import asyncio
+import hashlib
+import importlib.util
+import logging
+import os
+import shutil
+from functools import lru_cache
+from config import settings
+from services.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Viewport of the rendered card (matches the telegram_card templates)
+CARD_SIZE = (800, 1400)
+
+# Maximum number of cards rendered at once (and pages kept open for reuse)
+PAGE_POOL_SIZE = 4
+
+# Cards are sent as JPEG: Telegram re-encodes photos to JPEG anyway, and it is
+# several times smaller than PNG to encode and upload (Playwright has no WebP output)
+CARD_JPEG_QUALITY = 90
+
+# Seconds a rendered card is reused for identical HTML (e.g. the same pool
+# report requested again or sent to several chats)
+CARD_CACHE_TTL = 300
+
+_LAUNCH_ARGS = ["--no-sandbox", "--disable-gpu", "--disable-dev-shm-usage"]
+
+_playwright = None
+_browser = None
+_browser_lock = asyncio.Lock()
+_idle_pages = []
+_page_slots = asyncio.Semaphore(PAGE_POOL_SIZE)
+_card_cache = TTLCache(ttl=CARD_CACHE_TTL, maxsize=64)
+
+
+class CardRenderError(Exception):
+    """Raised when a report card cannot be rendered."""
+    pass
+
+
+@lru_cache(maxsize=1)
+def _find_chromium():
+    """Find Chromium executable in common locations (probed once per process)."""
+    if settings.chromium_path:
+        return settings.chromium_path
+    
+    # Common Chromium paths on different systems
+    chromium_paths = [
+        '/usr/bin/chromium',           # Render/Ubuntu
+        '/usr/bin/chromium-browser',   # Alternative Ubuntu
+        '/usr/bin/google-chrome',      # If Chrome is installed instead
+        shutil.which('chromium'),      # Try PATH
+        shutil.which('chromium-browser'),
+        shutil.which('google-chrome'),
+    ]
+    
+    for path in chromium_paths:
+        if path and os.path.exists(path):
+            return path
+    
+    return None
+
+
+@lru_cache(maxsize=1)
+def is_available() -> bool:
+    """Return True if Playwright is installed and cards can be rendered."""
+    # Only look the package up; it is imported when the browser is first launched
+    return importlib.util.find_spec("playwright") is not None
+
+
+async def _get_browser():
+    """Return the shared browser, launching it on first use."""
+    global _playwright, _browser
+    async with _browser_lock:
+        if _browser is None or not _browser.is_connected():
+            from playwright.async_api import async_playwright
+            
+            if _playwright is None:
+                _playwright = await async_playwright().start()
+            # Prefer a system Chromium (e.g. on Render), else Playwright's bundled one
+            chromium_path = _find_chromium()
+            # Pages of a previous (crashed) browser can't be reused
+            _idle_pages.clear()
+            _browser = await _playwright.chromium.launch(
+                headless=True,
+                executable_path=chromium_path,
+                args=_LAUNCH_ARGS
+            )
+            logger.info("✅ Card renderer started (Chrome: %s)", chromium_path or "bundled")
+    return _browser
+
+
+async def render_card(html: str, fit_content: bool = False) -> bytes:
+    """
+    Render an HTML document to a JPEG screenshot of the card viewport.
+    
+    Args:
+        html: Full HTML document to render
+        fit_content: Crop the screenshot to the body's height, for cards
+            shorter than the viewport
+    
+    Returns:
+        JPEG image bytes
+    
+    Raises:
+        CardRenderError: If the browser cannot be launched or the page fails to render
+    """
+    # The HTML fully determines the screenshot, so identical cards are rendered once
+    cache_key = (hashlib.blake2b(html.encode(), digest_size=16).digest(), fit_content)
+    cached = _card_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    async with _page_slots:
+        page = None
+        try:
+            browser = await _get_browser()
+            if _idle_pages:
+                page = _idle_pages.pop()
+            else:
+                width, height = CARD_SIZE
+                page = await browser.new_page(viewport={"width": width, "height": height})
+            
+            await page.set_content(html, wait_until="load")
+            clip = None
+            if fit_content:
+                width, height = CARD_SIZE
+                content_height = await page.evaluate("document.body.offsetHeight")
+                # An empty or absolutely positioned body measures 0; Playwright rejects a zero-height clip
+                clip = {"x": 0, "y": 0, "width": width, "height": max(1, min(content_height, height))}
+            image_bytes = await page.screenshot(type="jpeg", quality=CARD_JPEG_QUALITY, clip=clip)
+        except Exception as e:
+            # Don't return a page in an unknown state to the pool
+            if page is not None and not page.is_closed():
+                try:
+                    await page.close()
+                except Exception:
+                    # Keep the original render error
+                    pass
+            raise CardRenderError(f"Failed to render card: {str(e)}") from e
+        
+        _idle_pages.append(page)
+    
+    _card_cache.set(cache_key, image_bytes)
+    return image_bytes
+
+
+async def warmup() -> None:
+    """
+    Launch the browser and open a first page before any real card is requested,
+    so the Chromium cold start is paid at app startup instead of by a user.
+    Failures are only reported; rendering will retry the launch on demand.
+    """
+    if not is_available():
+        return
+    try:
+        await render_card("<html><body>warm</body></html>")
+        logger.info("✅ Card renderer warmed up")
+    except CardRenderError as e:
+        logger.warning("⚠️  Card renderer warmup failed: %s", e)
+
+
+async def close_browser() -> None:
+    """Close the shared browser and Playwright driver (called on app shutdown)."""
+    global _playwright, _browser
+    _idle_pages.clear()
+    if _browser is not None:
+        await _browser.close()
+        _browser = None
+    if _playwright is not None:
+        await _playwright.stop()
+        _playwright = None
@@ -1,13 +1,11 @@
 """
 Email sender service for sending pool performance reports via SMTP.
 """
-import asyncio
-import smtplib
+import aiosmtplib
 from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from pathlib import Path
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-from typing import Dict, Any
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+from typing import Any, Dict, List, Tuple
 from config import settings
 
 
@@ -16,6 +14,19 @@ class EmailSenderError(Exception):
     pass
 
 
+# Shared Jinja2 environment: templates are compiled once per process and never
+# re-stat'ed, since EmailSender is instantiated per request.
+_jinja_env = Environment(
+    loader=FileSystemLoader(str(Path(__file__).parent.parent / "templates")),
+    autoescape=select_autoescape(['html', 'xml']),
+    auto_reload=False,
+    cache_size=-1,
+    # Compiled templates persist in the temp dir, so restarts skip parsing;
+    # prefixed so they never mix with the (non-autoescaped) Telegram ones
+    bytecode_cache=FileSystemBytecodeCache(pattern="__jinja2_email_%s.cache")
+)
+
+
 class EmailSender:
     """Service for sending HTML emails via SMTP."""
     
@@ -34,12 +45,10 @@ class EmailSender:
             and self.from_email
         )
         
-        # Set up Jinja2 environment for template rendering
-        template_dir = Path(__file__).parent.parent / "templates"
-        self.jinja_env = Environment(
-            loader=FileSystemLoader(str(template_dir)),
-            autoescape=select_autoescape(['html', 'xml'])
-        )
+        # Jinja2 templates for rendering (compiled once, shared across instances)
+        self.jinja_env = _jinja_env
+        self._tpl_single = self.jinja_env.get_template("email_report.html")
+        self._tpl_multi = self.jinja_env.get_template("email_report_multi.html")
     
     def render_report_email(self, metrics_data: Dict[str, Any], multi_pool: bool = False) -> str:
         """
@@ -53,10 +62,8 @@ class EmailSender:
             Rendered HTML string
         """
         try:
-            template_name = "email_report_multi.html" if multi_pool else "email_report.html"
-            template = self.jinja_env.get_template(template_name)
-            html_content = template.render(**metrics_data)
-            return html_content
+            template = self._tpl_multi if multi_pool else self._tpl_single
+            return template.render(**metrics_data)
         except Exception as e:
             raise EmailSenderError(f"Error rendering email template: {str(e)}")
     
@@ -74,48 +81,59 @@ class EmailSender:
             subject: Email subject line
             html_content: HTML content of the email
             
+        Raises:
+            EmailSenderError: If email sending fails
+        """
+        await self.send_many([(recipient_email, subject, html_content)])
+    
+    async def send_many(self, messages: List[Tuple[str, str, str]]) -> None:
+        """
+        Send several HTML emails over a single authenticated SMTP session.
+        
+        Args:
+            messages: List of (recipient_email, subject, html_content) tuples
+            
         Raises:
             EmailSenderError: If email sending fails
         """
         if not self.enabled:
             print("ℹ️  Email sending disabled or SMTP not configured; skipping email.")
             return
-
-        def _send_sync() -> None:
-            # Create message
-            message = MIMEMultipart('alternative')
-            message['Subject'] = subject
-            message['From'] = self.from_email
-            message['To'] = recipient_email
-
-            # Attach HTML content
-            html_part = MIMEText(html_content, 'html')
-            message.attach(html_part)
-
-            # Send email via SMTP (explicit timeout to avoid long hangs)
-            with smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=15) as server:
-                server.ehlo()
-                server.starttls()
-                server.ehlo()
-                server.login(self.smtp_username, self.smtp_password)
-                server.send_message(message)
-
+        
+        if not messages:
+            return
+        
         try:
-            # Run SMTP in a thread so we don't block the FastAPI event loop.
-            await asyncio.to_thread(_send_sync)
-            print(f"✅ Email sent successfully to {recipient_email}")
-        except smtplib.SMTPAuthenticationError:
+            # Send all emails via one SMTP session (explicit timeout to avoid long hangs)
+            async with aiosmtplib.SMTP(
+                hostname=self.smtp_host,
+                port=self.smtp_port,
+                start_tls=True,
+                timeout=15
+            ) as server:
+                await server.login(self.smtp_username, self.smtp_password)
+                
+                for recipient_email, subject, html_content in messages:
+                    # Single-part HTML message (no attachments, so no multipart wrapper)
+                    message = MIMEText(html_content, 'html', 'utf-8')
+                    message['Subject'] = subject
+                    message['From'] = self.from_email
+                    message['To'] = recipient_email
+                    
+                    await server.sendmail(self.from_email, [recipient_email], message.as_bytes())
+                    print(f"✅ Email sent successfully to {recipient_email}")
+        except aiosmtplib.SMTPAuthenticationError:
             raise EmailSenderError(
                 "SMTP authentication failed. Please check your username and password."
             )
-        except smtplib.SMTPException as e:
+        except aiosmtplib.SMTPException as e:
             raise EmailSenderError(f"SMTP error occurred: {str(e)}")
         except Exception as e:
             raise EmailSenderError(f"Error sending email: {str(e)}")
     
     async def send_pool_report(
         self,
-        recipient_email: str,
+        recipient_email: str | List[str],
         pool_name: str,
         metrics_data: Dict[str, Any],
         multi_pool: bool = False
@@ -124,7 +142,8 @@ class EmailSender:
         Send a complete pool performance report email.
         
         Args:
-            recipient_email: Email address of the recipient
+            recipient_email: Email address of the recipient, or a list of addresses
+                             (sent over one SMTP session)
             pool_name: Name of the pool (or description for multi-pool)
             metrics_data: Dictionary containing formatted metrics
             multi_pool: If True, send multi-pool comparison report
@@ -138,5 +157,8 @@ class EmailSender:
         else:
             subject = f"Balancer Pool Report: {pool_name}"
         
-        # Send the email
-        await self.send_report_email(recipient_email, subject, html_content)
+        # Send the email(s)
+        if isinstance(recipient_email, list):
+            await self.send_many([(email, subject, html_content) for email in recipient_email])
+        else:
+            await self.send_report_email(recipient_email, subject, html_content)
@@ -2,11 +2,91 @@
 Metrics calculator service for comparing pool performance.
 Analyzes current metrics vs 15 days ago.
 """
-from datetime import datetime, timedelta
+import asyncio
+from bisect import bisect_left
+import heapq
+import logging
+import time
+from datetime import datetime
+from functools import lru_cache
+from operator import attrgetter
 from typing import Dict, Any
+from services import snapshot_cache
 from services.balancer_api import BalancerAPI
+from services.ttl_cache import TTLCache
 from models import PoolMetrics, MultiPoolMetrics
 
+logger = logging.getLogger(__name__)
+
+
+# Display format for report timestamps
+REPORT_TIME_FORMAT = "%B %d, %Y at %H:%M UTC"
+
+# Placeholder for unavailable values and marker for 24h-based estimates in reports
+_NA = "N/A"
+_EST_SUFFIX = " (est.)"
+
+# Maximum number of pools fetched concurrently in a multi-pool report
+_MAX_CONCURRENT_POOLS = 8
+
+# Computed metrics per (pool address, blockchain), so repeated reports for the
+# same pools within a few minutes skip the API calls and calculations entirely
+_metrics_cache = TTLCache(ttl=300)
+
+# Optional multi-pool rankings (ranking_by name) to the PoolMetrics attribute ranked
+_CUSTOM_RANKINGS = {
+    "swap_fee": "swap_fee",
+    "rebalance_count": "rebalance_count_15d",
+    "boosted_apr": "boosted_apr",
+}
+
+# API pool type (upper-cased) to standardized type
+_POOL_TYPE_MAP = {
+    "WEIGHTED": "Weighted",
+    "COMPOSABLE_STABLE": "Stable",
+    "COMPOSABLESTABLE": "Stable",
+    "META_STABLE": "MetaStable",
+    "METASTABLE": "MetaStable",
+    "STABLE": "Stable",
+    "BOOSTED": "Boosted",
+    "GYRO": "Gyro",
+    "GYROE": "Gyro",
+    "FX": "FX",
+    "LVR": "LVR",
+}
+
+
+def _apr_from_items(dynamic_data: Dict[str, Any]) -> float | None:
+    """Sum of all APR items, or the first item's APR if the sum isn't positive."""
+    apr_items = dynamic_data.get("aprItems")
+    if not apr_items:
+        return None
+    total_apr = sum(float(item.get("apr", 0)) for item in apr_items)
+    return total_apr if total_apr > 0 else float(apr_items[0].get("apr", 0))
+
+
+# APR sources in order of preference. Each returns None when its source is
+# absent; the fee-derived APR is the last resort in calculate_pool_metrics
+_APR_EXTRACTORS = (
+    lambda pool, dynamic: float(dynamic["totalApr"]) if "totalApr" in dynamic else None,
+    lambda pool, dynamic: _apr_from_items(dynamic),
+    lambda pool, dynamic: float(dynamic["apr"]) if "apr" in dynamic else None,
+    lambda pool, dynamic: float(pool["apr"]) if "totalShares" in pool and "apr" in pool else None,
+)
+
+
+def _format_change_percent(value: float) -> str:
+    """Format a signed change percentage, using more decimal places for very small values."""
+    magnitude = abs(value)
+    spec = "+.4f" if magnitude < 0.01 else ("+.3f" if magnitude < 1.0 else "+.2f")
+    return f"{value:{spec}}%"
+
+
+@lru_cache(maxsize=64)
+def _normalize_pool_type(raw_type: str) -> str:
+    """Map a raw API pool type string to its standardized type (unknown types pass through)."""
+    return _POOL_TYPE_MAP.get(raw_type.upper(), raw_type)
+
 
 class MetricsCalculator:
     """Service for calculating and comparing pool metrics."""
@@ -24,23 +104,13 @@ class MetricsCalculator:
         Returns:
             Standardized pool type string
         """
-        pool_type = pool_data.get("type") or pool_data.get("poolType", "")
-        
-        # Normalize types
-        type_map = {
-            "WEIGHTED": "Weighted",
-            "COMPOSABLE_STABLE": "Stable",
-            "COMPOSABLESTABLE": "Stable",
-            "META_STABLE": "MetaStable",
-            "METASTABLE": "MetaStable",
-            "STABLE": "Stable",
-            "BOOSTED": "Boosted",
-            "GYRO": "Gyro",
-            "GYROE": "Gyro",
-            "FX": "FX",
-            "LVR": "LVR",
-        }
-        return type_map.get(pool_type.upper(), pool_type)
+        # Detection runs for both static and dynamic metrics, so remember the
+        # result on the pool data alongside the other "_" metadata keys
+        pool_type = pool_data.get("_pool_type")
+        if pool_type is None:
+            pool_type = _normalize_pool_type(pool_data.get("type") or pool_data.get("poolType", ""))
+            pool_data["_pool_type"] = pool_type
+        return pool_type
     
     def _extract_static_metrics(self, pool_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -69,17 +139,13 @@ class MetricsCalculator:
             tokens = pool_data.get("allTokens") or pool_data.get("displayTokens") or pool_data.get("tokens", [])
             weights_dict = {}
             for token in tokens:
-                symbol = token.get("symbol", "")
+                symbol = token.get("symbol")
                 weight = token.get("weight")
                 if symbol and weight:
                     # Convert weight to percentage (weights are usually 0-1)
                     weight_float = float(weight)
-                    if weight_float <= 1.0:
-                        weight_float *= 100
-                    weights_dict[symbol] = round(weight_float, 2)
-            
-            if weights_dict:
-                token_weights = weights_dict
+                    weights_dict[symbol] = round(weight_float * 100 if weight_float <= 1.0 else weight_float, 2)
+            token_weights = weights_dict or None
         
         is_core_pool = pool_data.get("isCore", False)
         
@@ -93,7 +159,8 @@ class MetricsCalculator:
     def _extract_dynamic_metrics(
         self, 
         pool_data: Dict[str, Any],
-        snapshot_15d: Dict[str, Any] | None
+        snapshot_15d: Dict[str, Any] | None,
+        pool_type: str
     ) -> Dict[str, Any]:
         """
         Extract time-dependent metrics with historical comparison.
@@ -101,11 +168,11 @@ class MetricsCalculator:
         Args:
             pool_data: Current pool data from API
             snapshot_15d: Snapshot from 15 days ago (if available)
+            pool_type: Standardized pool type (from _extract_static_metrics)
             
         Returns:
             Dictionary with dynamic metrics
         """
-        pool_type = self._detect_pool_type(pool_data)
         metrics = {}
         
         # Boosted APR (from aprItems)
@@ -147,6 +214,50 @@ class MetricsCalculator:
         
         return f"https://balancer.fi/pools/{blockchain}/{version}/{pool_address.lower()}"
     
+    async def _get_snapshots(
+        self,
+        pool_address: str,
+        pool_version: str,
+        blockchain: str | None
+    ) -> list:
+        """Get historical snapshots (30 days to ensure we have 15 days ago data)."""
+        return await snapshot_cache.get_snapshots(
+            self.api,
+            pool_address,
+            days_back=30,
+            pool_version=pool_version,
+            blockchain=blockchain
+        )
+    
+    def _nearest_snapshot(
+        self,
+        snapshots: list,
+        target_timestamp: int,
+        max_distance: int = 86400
+    ) -> Dict[str, Any] | None:
+        """
+        Find the snapshot closest to a timestamp, matching BalancerAPI.get_snapshot_at_timestamp.
+        
+        Args:
+            snapshots: List of pool snapshots, sorted by ascending timestamp
+            target_timestamp: Target Unix timestamp
+            max_distance: Maximum distance in seconds for a snapshot to count
+            
+        Returns:
+            Closest snapshot within max_distance, or None
+        """
+        index = bisect_left(snapshots, target_timestamp, key=lambda s: int(s.get("timestamp", 0)))
+        
+        # Only the neighbours around the insertion point can be closest;
+        # the earlier one wins ties
+        closest = None
+        closest_distance = max_distance + 1
+        for snapshot in snapshots[max(index - 1, 0):index + 1]:
+            distance = abs(int(snapshot.get("timestamp", 0)) - target_timestamp)
+            if distance < closest_distance:
+                closest, closest_distance = snapshot, distance
+        return closest
+    
     async def calculate_pool_metrics(self, pool_address: str, blockchain: str | None = None) -> PoolMetrics:
         """
         Calculate comprehensive pool metrics comparing current vs 15 days ago.
@@ -158,31 +269,40 @@ class MetricsCalculator:
         Returns:
             PoolMetrics object with all calculated metrics
         """
-        # Get current pool data
-        current_pool = await self.api.get_current_pool_data(pool_address, blockchain=blockchain)
-        
-        # Detect pool version
-        pool_version = current_pool.get("_api_version", "v2")
-        
-        # Get historical snapshots (30 days to ensure we have 15 days ago data)
-        snapshots = await self.api.get_pool_snapshots(
-            pool_address, 
-            days_back=30,
-            pool_version=pool_version,
-            blockchain=blockchain
-        )
+        cache_key = (pool_address.lower(), blockchain.lower() if blockchain else None)
+        cached = _metrics_cache.get(cache_key)
+        if cached is not None:
+            return cached.model_copy()
         
         # Calculate timestamp for 15 days ago
-        fifteen_days_ago = datetime.utcnow() - timedelta(days=15)
-        fifteen_days_ago_ts = int(fifteen_days_ago.timestamp())
+        fifteen_days_ago_ts = int(time.time()) - 15 * 86400
+        
+        # When the pool version is already known, the snapshot query doesn't
+        # depend on the current pool data and both can run concurrently
+        pool_version = self.api.known_pool_version(pool_address, blockchain=blockchain)
+        if pool_version:
+            current_pool, snapshots = await asyncio.gather(
+                self.api.get_current_pool_data(pool_address, blockchain=blockchain),
+                self._get_snapshots(pool_address, pool_version, blockchain)
+            )
+        else:
+            current_pool = await self.api.get_current_pool_data(pool_address, blockchain=blockchain)
         
-        # Get snapshot from 15 days ago
-        snapshot_15d_ago = await self.api.get_snapshot_at_timestamp(
-            pool_address,
-            fifteen_days_ago_ts,
-            pool_version=pool_version,
-            blockchain=blockchain
-        )
+        # Detect pool version (and fetch history for it if it wasn't known up front)
+        if current_pool.get("_api_version", "v2") != pool_version:
+            pool_version = current_pool.get("_api_version", "v2")
+            snapshots = await self._get_snapshots(pool_address, pool_version, blockchain)
+        
+        # Get snapshot from 15 days ago (the 30-day history already covers it)
+        if snapshots:
+            snapshot_15d_ago = self._nearest_snapshot(snapshots, fifteen_days_ago_ts)
+        else:
+            snapshot_15d_ago = await self.api.get_snapshot_at_timestamp(
+                pool_address,
+                fifteen_days_ago_ts,
+                pool_version=pool_version,
+                blockchain=blockchain
+            )
         
         # Extract current metrics
         dynamic_data = current_pool.get("dynamicData", {})
@@ -200,8 +320,11 @@ class MetricsCalculator:
             tvl_15d_ago = float(snapshots[0].get("liquidity", 0))
         elif pool_version == "v3":
             # V3 pools without historical data: use current as baseline
-            print(f"⚠️  No historical snapshots available for V3 pool")
-            print(f"   Using current values only - no historical comparison possible")
+            logger.warning(
+                "⚠️  No historical snapshots available for V3 pool %s; "
+                "using current values only - no historical comparison possible",
+                pool_address
+            )
             tvl_15d_ago = tvl_current
         
         # Calculate TVL change percentage
@@ -228,7 +351,7 @@ class MetricsCalculator:
             )
         else:
             # No historical data: estimate from 24h data
-            print(f"   Estimating 15-day metrics from 24h data")
+            logger.info("   Estimating 15-day metrics from 24h data for %s", pool_address)
             volume_24h = float(dynamic_data.get("volume24h", 0))
             fees_24h = float(dynamic_data.get("fees24h", 0))
             volume_15_days = volume_24h * 15
@@ -255,31 +378,14 @@ class MetricsCalculator:
             if current_cumulative_fees > fees_15d_ago:
                 fees_change_percent = ((current_cumulative_fees - fees_15d_ago) / fees_15d_ago) * 100
         
-        # Extract APR
+        # Extract APR: first non-zero value from the sources in _APR_EXTRACTORS
         apr_current = None
-        
-        if "totalApr" in dynamic_data:
-            apr_current = float(dynamic_data.get("totalApr", 0))
-        
-        if apr_current is None or apr_current == 0:
-            apr_items = dynamic_data.get("aprItems", [])
-            if apr_items:
-                # Sum all APR items for total APR
-                total_apr = sum(float(item.get("apr", 0)) for item in apr_items)
-                if total_apr > 0:
-                    apr_current = total_apr
-                else:
-                    # Fallback: use first item
-                    apr_current = float(apr_items[0].get("apr", 0))
-        
-        if apr_current is None or apr_current == 0:
-            if "apr" in dynamic_data:
-                apr_current = float(dynamic_data.get("apr", 0))
-        
-        if apr_current is None or apr_current == 0:
-            if "totalShares" in current_pool:
-                if "apr" in current_pool:
-                    apr_current = float(current_pool.get("apr", 0))
+        for extract_apr in _APR_EXTRACTORS:
+            value = extract_apr(current_pool, dynamic_data)
+            if value is not None:
+                apr_current = value
+                if value:
+                    break
         
         if (apr_current is None or apr_current == 0) and tvl_current > 0 and fees_15_days > 0:
             # Get daily average from 15-day period
@@ -295,10 +401,14 @@ class MetricsCalculator:
         static_metrics = self._extract_static_metrics(current_pool)
         
         # Extract dynamic metrics (time-dependent)
-        dynamic_metrics = self._extract_dynamic_metrics(current_pool, snapshot_15d_ago)
+        dynamic_metrics = self._extract_dynamic_metrics(
+            current_pool,
+            snapshot_15d_ago,
+            static_metrics["pool_type"]
+        )
         
-        # Create and return metrics
-        return PoolMetrics(
+        # Create, cache and return metrics
+        metrics = PoolMetrics(
             tvl_current=tvl_current,
             tvl_15_days_ago=tvl_15d_ago,
             tvl_change_percent=tvl_change_percent,
@@ -322,6 +432,8 @@ class MetricsCalculator:
             surge_fees_15d_ago=dynamic_metrics.get("surge_fees_15d_ago"),
             rebalance_count_15d=dynamic_metrics.get("rebalance_count_15d")
         )
+        _metrics_cache.set(cache_key, metrics)
+        return metrics.model_copy()
     
     def _calculate_period_metrics(
         self,
@@ -332,7 +444,7 @@ class MetricsCalculator:
         Calculate cumulative volume and fees for a period.
         
         Args:
-            snapshots: List of pool snapshots
+            snapshots: List of pool snapshots, sorted by ascending timestamp
             start_timestamp: Start of the period (Unix timestamp)
             
         Returns:
@@ -341,57 +453,44 @@ class MetricsCalculator:
         if not snapshots:
             return 0.0, 0.0
         
-        # Filter snapshots within the period
-        period_snapshots = [
-            s for s in snapshots
-            if int(s.get("timestamp", 0)) >= start_timestamp
-        ]
-        
-        if not period_snapshots:
+        # Snapshots are sorted by timestamp, so the period starts at the first
+        # snapshot at or after start_timestamp
+        start_index = bisect_left(
+            snapshots,
+            start_timestamp,
+            key=lambda s: int(s.get("timestamp", 0))
+        )
+        if start_index == len(snapshots):
             return 0.0, 0.0
         
-        # Sort by timestamp to ensure correct ordering
-        period_snapshots.sort(key=lambda x: int(x.get("timestamp", 0)))
+        # Calculate cumulative metrics against the snapshot just before the period
+        # starts (or the earliest one inside it)
+        baseline_snapshot = snapshots[start_index - 1] if start_index > 0 else snapshots[start_index]
+        latest_snapshot = snapshots[-1]
         
-        # Get the snapshot just before the period starts
-        pre_period_snapshots = [
-            s for s in snapshots
-            if int(s.get("timestamp", 0)) < start_timestamp
-        ]
+        base_volume = float(baseline_snapshot.get("swapVolume", 0))
+        base_fees = float(baseline_snapshot.get("swapFees", 0))
+        latest_volume = float(latest_snapshot.get("swapVolume", 0))
+        latest_fees = float(latest_snapshot.get("swapFees", 0))
         
-        # Calculate cumulative metrics
-        if period_snapshots:
-            latest_snapshot = period_snapshots[-1]
-            earliest_snapshot = period_snapshots[0]
-            
-            if pre_period_snapshots:
-                baseline_snapshot = max(
-                    pre_period_snapshots,
-                    key=lambda x: int(x.get("timestamp", 0))
-                )
-                base_volume = float(baseline_snapshot.get("swapVolume", 0))
-                base_fees = float(baseline_snapshot.get("swapFees", 0))
-            else:
-                base_volume = float(earliest_snapshot.get("swapVolume", 0))
-                base_fees = float(earliest_snapshot.get("swapFees", 0))
-            
-            latest_volume = float(latest_snapshot.get("swapVolume", 0))
-            latest_fees = float(latest_snapshot.get("swapFees", 0))
-            
-            total_volume = max(0, latest_volume - base_volume)
-            total_fees = max(0, latest_fees - base_fees)
-            
-            return total_volume, total_fees
+        total_volume = max(0, latest_volume - base_volume)
+        total_fees = max(0, latest_fees - base_fees)
         
-        return 0.0, 0.0
+        return total_volume, total_fees
     
-    def format_metrics_for_email(self, metrics: PoolMetrics, pool_data: Dict = None) -> Dict[str, Any]:
+    def format_metrics_for_email(
+        self,
+        metrics: PoolMetrics,
+        pool_data: Dict = None,
+        now: datetime | None = None
+    ) -> Dict[str, Any]:
         """
         Format metrics into a dictionary suitable for email template rendering.
         
         Args:
             metrics: PoolMetrics object
             pool_data: Raw pool data from API (for token info)
+            now: Report time (UTC); defaults to the current time
             
         Returns:
             Dictionary with formatted metrics
@@ -416,23 +515,15 @@ class MetricsCalculator:
         
         # Format the change percentages - use appropriate precision
         if not is_v3_estimated:
-            # Use more decimal places for very small percentages
-            if abs(metrics.volume_change_percent) < 0.01:
-                volume_change_formatted = f"{metrics.volume_change_percent:+.4f}%"
-            elif abs(metrics.volume_change_percent) < 1.0:
-                volume_change_formatted = f"{metrics.volume_change_percent:+.3f}%"
-            else:
-                volume_change_formatted = f"{metrics.volume_change_percent:+.2f}%"
-            
-            if abs(metrics.fees_change_percent) < 0.01:
-                fees_change_formatted = f"{metrics.fees_change_percent:+.4f}%"
-            elif abs(metrics.fees_change_percent) < 1.0:
-                fees_change_formatted = f"{metrics.fees_change_percent:+.3f}%"
-            else:
-                fees_change_formatted = f"{metrics.fees_change_percent:+.2f}%"
+            tvl_change_formatted = f"{metrics.tvl_change_percent:+.2f}%"
+            volume_change_formatted = _format_change_percent(metrics.volume_change_percent)
+            fees_change_formatted = _format_change_percent(metrics.fees_change_percent)
+            estimate_suffix = ""
         else:
-            volume_change_formatted = "N/A"
-            fees_change_formatted = "N/A"
+            tvl_change_formatted = _NA
+            volume_change_formatted = _NA
+            fees_change_formatted = _NA
+            estimate_suffix = _EST_SUFFIX
         
         result = {
             "pool_name": metrics.pool_name,
@@ -441,18 +532,18 @@ class MetricsCalculator:
             "pool_tokens": tokens,
             "tvl_current": f"${metrics.tvl_current:,.2f}",
             "tvl_15d_ago": f"${metrics.tvl_15_days_ago:,.2f}",
-            "tvl_change_percent": f"{metrics.tvl_change_percent:+.2f}%" if not is_v3_estimated else "N/A",
+            "tvl_change_percent": tvl_change_formatted,
             "tvl_change_positive": metrics.tvl_change_percent >= 0,
-            "volume_15d": f"${metrics.volume_15_days:,.2f}" + (" (est.)" if is_v3_estimated else ""),
+            "volume_15d": f"${metrics.volume_15_days:,.2f}{estimate_suffix}",
             "volume_change_percent": volume_change_formatted,
             "volume_change_positive": metrics.volume_change_percent >= 0,
-            "fees_15d": f"${metrics.fees_15_days:,.2f}" + (" (est.)" if is_v3_estimated else ""),
+            "fees_15d": f"${metrics.fees_15_days:,.2f}{estimate_suffix}",
             "fees_change_percent": fees_change_formatted,
             "fees_change_positive": metrics.fees_change_percent >= 0,
-            "apr_current": f"{metrics.apr_current * 100:.2f}%" if metrics.apr_current else "N/A",
+            "apr_current": f"{metrics.apr_current * 100:.2f}%" if metrics.apr_current else _NA,
             # Static metrics
             "pool_type": metrics.pool_type,
-            "swap_fee": f"{metrics.swap_fee * 100:.4f}%" if metrics.swap_fee > 0 else "N/A",
+            "swap_fee": f"{metrics.swap_fee * 100:.4f}%" if metrics.swap_fee > 0 else _NA,
             "is_core_pool": metrics.is_core_pool,
             "token_weights": metrics.token_weights,
             # Dynamic metrics
@@ -462,11 +553,31 @@ class MetricsCalculator:
             "surge_fees_15d_ago": f"${metrics.surge_fees_15d_ago:,.2f}" if metrics.surge_fees_15d_ago else None,
             "rebalance_count_15d": metrics.rebalance_count_15d,
             "is_v3_estimated": is_v3_estimated,
-            "timestamp": datetime.utcnow().strftime("%B %d, %Y at %H:%M UTC")
+            "timestamp": (now or datetime.utcnow()).strftime(REPORT_TIME_FORMAT)
         }
         
         return result
     
+    async def _safe_calc(self, pool_address: str, semaphore: asyncio.Semaphore) -> PoolMetrics | None:
+        """
+        Calculate metrics for one pool of a multi-pool report, skipping it on failure.
+        
+        Args:
+            pool_address: Pool address
+            semaphore: Limits how many pools are fetched at once
+            
+        Returns:
+            PoolMetrics, or None if the pool could not be calculated
+        """
+        async with semaphore:
+            try:
+                metrics = await self.calculate_pool_metrics(pool_address)
+                logger.info("✅ Calculated metrics for %s", metrics.pool_name)
+                return metrics
+            except Exception as e:
+                logger.warning("⚠️  Skipping pool %s: %s", pool_address, e)
+                return None
+    
     async def calculate_multi_pool_metrics(
         self, 
         pool_addresses: list[str],
@@ -484,26 +595,39 @@ class MetricsCalculator:
         """
         if ranking_by is None:
             ranking_by = []
-        # Calculate metrics for each pool
-        pools_metrics = []
-        for address in pool_addresses:
-            try:
-                metrics = await self.calculate_pool_metrics(address)
-                pools_metrics.append(metrics)
-                print(f"✅ Calculated metrics for {metrics.pool_name}")
-            except Exception as e:
-                print(f"⚠️  Skipping pool {address}: {str(e)}")
-                continue
+        # Fetch every pool's history in one batched query up front; the per-pool
+        # calculations below then read it from the snapshot cache
+        await snapshot_cache.prefetch_snapshots(self.api, pool_addresses, days_back=30)
+        
+        # Calculate metrics for all pools concurrently (bounded), keeping input order
+        semaphore = asyncio.Semaphore(_MAX_CONCURRENT_POOLS)
+        results = await asyncio.gather(
+            *(self._safe_calc(address, semaphore) for address in pool_addresses)
+        )
+        pools_metrics = [m for m in results if m is not None]
         
         if not pools_metrics:
             raise ValueError("No valid pool metrics could be calculated")
         
+        # Calculate totals in a single pass; the APR is weighted by TVL
+        total_volume = 0.0
+        total_fees = 0.0
+        total_tvl = 0.0
+        weighted_apr_sum = 0.0
+        for p in pools_metrics:
+            total_volume += p.volume_15_days
+            total_fees += p.fees_15_days
+            total_tvl += p.tvl_current
+            if p.apr_current:
+                weighted_apr_sum += p.apr_current * p.tvl_current
+        weighted_apr = weighted_apr_sum / total_tvl if total_tvl > 0 else 0.0
+        
         # Rank by TVL increase (absolute change from 15 days ago)
-        sorted_by_tvl_increase = sorted(
+        sorted_by_tvl_increase = heapq.nlargest(
+            3,
             pools_metrics,
-            key=lambda p: p.tvl_current - p.tvl_15_days_ago,
-            reverse=True
-        )[:3]
+            key=lambda p: p.tvl_current - p.tvl_15_days_ago
+        )
         top_3_tvl = [
             (
                 p.pool_name, 
@@ -515,12 +639,7 @@ class MetricsCalculator:
         ]
         
         # Rank by volume (descending) - showing total volume and percentage of portfolio
-        total_volume = sum(p.volume_15_days for p in pools_metrics)
-        sorted_by_volume = sorted(
-            pools_metrics, 
-            key=lambda p: p.volume_15_days, 
-            reverse=True
-        )[:3]
+        sorted_by_volume = heapq.nlargest(3, pools_metrics, key=attrgetter("volume_15_days"))
         top_3_volume = [
             (
                 p.pool_name, 
@@ -531,47 +650,19 @@ class MetricsCalculator:
             for p in sorted_by_volume
         ]
         
-        # Calculate totals
-        total_fees = sum(p.fees_15_days for p in pools_metrics)
-        
-        # Calculate weighted average APR (by TVL)
-        total_tvl = sum(p.tvl_current for p in pools_metrics)
-        weighted_apr = 0.0
-        if total_tvl > 0:
-            for p in pools_metrics:
-                if p.apr_current:
-                    weight = p.tvl_current / total_tvl
-                    weighted_apr += p.apr_current * weight
-        
         # Generate custom rankings based on ranking_by parameter
         custom_rankings = {}
         
-        if "swap_fee" in ranking_by:
-            sorted_by_fee = sorted(pools_metrics, key=lambda p: p.swap_fee, reverse=True)[:3]
-            custom_rankings["swap_fee"] = [
-                (p.pool_name, p.swap_fee, p.pool_url) for p in sorted_by_fee
-            ]
-        
-        if "rebalance_count" in ranking_by:
-            # Filter pools that have rebalance data
-            rebalanceable = [p for p in pools_metrics if p.rebalance_count_15d is not None]
-            if rebalanceable:
-                sorted_by_rebalance = sorted(
-                    rebalanceable, 
-                    key=lambda p: p.rebalance_count_15d, 
-                    reverse=True
-                )[:3]
-                custom_rankings["rebalance_count"] = [
-                    (p.pool_name, p.rebalance_count_15d, p.pool_url) for p in sorted_by_rebalance
-                ]
-        
-        if "boosted_apr" in ranking_by:
-            # Filter pools that have boosted APR
-            boosted = [p for p in pools_metrics if p.boosted_apr is not None]
-            if boosted:
-                sorted_by_boosted = sorted(boosted, key=lambda p: p.boosted_apr, reverse=True)[:3]
-                custom_rankings["boosted_apr"] = [
-                    (p.pool_name, p.boosted_apr, p.pool_url) for p in sorted_by_boosted
+        for ranking, attribute in _CUSTOM_RANKINGS.items():
+            if ranking not in ranking_by:
+                continue
+            # Only pools that have this metric take part in the ranking
+            key = attrgetter(attribute)
+            candidates = [p for p in pools_metrics if key(p) is not None]
+            if candidates:
+                custom_rankings[ranking] = [
+                    (p.pool_name, key(p), p.pool_url)
+                    for p in heapq.nlargest(3, candidates, key=key)
                 ]
         
         return MultiPoolMetrics(
@@ -583,12 +674,17 @@ class MetricsCalculator:
             total_apr=weighted_apr
         )
     
-    def format_multi_pool_metrics_for_email(self, metrics: MultiPoolMetrics) -> Dict[str, Any]:
+    def format_multi_pool_metrics_for_email(
+        self,
+        metrics: MultiPoolMetrics,
+        now: datetime | None = None
+    ) -> Dict[str, Any]:
         """
         Format multi-pool metrics for email template.
         
         Args:
             metrics: MultiPoolMetrics object
+            now: Report time (UTC); defaults to the current time
             
         Returns:
             Dictionary with formatted data
@@ -616,7 +712,7 @@ class MetricsCalculator:
                 for idx, (name, tvl_increase, percentage, url) in enumerate(metrics.top_3_by_tvl)
             ],
             "total_fees": f"${metrics.total_fees:,.2f}",
-            "total_apr": f"{metrics.total_apr * 100:.2f}%" if metrics.total_apr > 0 else "N/A",
+            "total_apr": f"{metrics.total_apr * 100:.2f}%" if metrics.total_apr > 0 else _NA,
             "custom_rankings": metrics.custom_rankings,
-            "timestamp": datetime.utcnow().strftime("%B %d, %Y at %H:%M UTC")
+            "timestamp": (now or datetime.utcnow()).strftime(REPORT_TIME_FORMAT)
         }
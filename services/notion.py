@@ -1,6 +1,9 @@
+import asyncio
+import logging
 import requests
 import sys
 import re
+import threading
 from pathlib import Path
 from typing import List, Dict, Any
 
@@ -8,6 +11,9 @@ from typing import List, Dict, Any
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import settings
+from services.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
 
 POOLS_DATABASE_ID = "67adabecde574aae99ae7bcbf992a2da"
 WHITELIST_DATABASE_ID = "2efe395e228180579172ed23fc480656"
@@ -19,6 +25,28 @@ headers = {
     "Content-Type": "application/json"
 }
 
+# One session per thread, so paginated queries reuse a pooled HTTPS connection;
+# requests.Session isn't documented as thread-safe and prefetch_all queries
+# the databases from worker threads
+_thread_local = threading.local()
+
+
+def _get_session() -> requests.Session:
+    """Return this thread's Notion session, creating it on first use."""
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(headers)
+        _thread_local.session = session
+    return session
+
+# Seconds Notion query results are reused before querying the API again
+NOTION_CACHE_TTL = 60
+
+# Raw pages per database ID, and parsed whitelist/clients data and lookup indexes
+_pages_cache = TTLCache(ttl=NOTION_CACHE_TTL)
+_parsed_cache = TTLCache(ttl=NOTION_CACHE_TTL)
+
 
 def extract_property_value(property_data: Dict[str, Any], property_type: str) -> Any:
     """Extract value from a Notion property based on its type."""
@@ -43,10 +71,14 @@ def extract_property_value(property_data: Dict[str, Any], property_type: str) ->
 
 
 def query_database_pages(database_id: str = None) -> List[Dict[str, Any]]:
-    """Query all pages from a Notion database."""
+    """Query all pages from a Notion database (cached for NOTION_CACHE_TTL seconds)."""
     if database_id is None:
         database_id = POOLS_DATABASE_ID
     
+    cached = _pages_cache.get(database_id)
+    if cached is not None:
+        return list(cached)
+    
     url = f"https://api.notion.com/v1/databases/{database_id}/query"
     
     all_pages = []
@@ -58,7 +90,7 @@ def query_database_pages(database_id: str = None) -> List[Dict[str, Any]]:
         if start_cursor:
             payload["start_cursor"] = start_cursor
         
-        response = requests.post(url, headers=headers, json=payload)
+        response = _get_session().post(url, json=payload, timeout=30)
         response.raise_for_status()
         
         data = response.json()
@@ -67,11 +99,16 @@ def query_database_pages(database_id: str = None) -> List[Dict[str, Any]]:
         has_more = data.get("has_more", False)
         start_cursor = data.get("next_cursor")
     
-    return all_pages
+    _pages_cache.set(database_id, all_pages)
+    return list(all_pages)
 
 
 def get_whitelist_data() -> List[Dict[str, Any]]:
     """Get cleaned whitelist data with only username and user_id columns."""
+    cached = _parsed_cache.get("whitelist")
+    if cached is not None:
+        return list(cached)
+    
     pages = query_database_pages(WHITELIST_DATABASE_ID)
 
     def _to_text(prop: Dict[str, Any] | None) -> str:
@@ -137,7 +174,13 @@ def get_whitelist_data() -> List[Dict[str, Any]]:
                 "user_id": user_id,
             })
 
-    return cleaned
+    _parsed_cache.set("whitelist", cleaned)
+    return list(cleaned)
+
+
+# balancer.fi/pools/<blockchain>/<version>/<address>, and a bare pool address
+_STRICT_POOL_URL_RE = re.compile(r'https?://balancer\.fi/pools/([^/]+)/([^/]+)/(0x[a-fA-F0-9]{40})')
+_ADDRESS_RE = re.compile(r'0x[a-fA-F0-9]{40}')
 
 
 def parse_balancer_url(url: str) -> Dict[str, str] | None:
@@ -146,8 +189,7 @@ def parse_balancer_url(url: str) -> Dict[str, str] | None:
         return None
     
     url = url.strip()
-    strict_pattern = r'https?://balancer\.fi/pools/([^/]+)/([^/]+)/(0x[a-fA-F0-9]{40})'
-    match = re.search(strict_pattern, url)
+    match = _STRICT_POOL_URL_RE.search(url)
     
     if match:
         return {
@@ -158,7 +200,7 @@ def parse_balancer_url(url: str) -> Dict[str, str] | None:
         }
     
     # Fallback: find address and infer blockchain/version
-    addr_match = re.search(r'0x[a-fA-F0-9]{40}', url)
+    addr_match = _ADDRESS_RE.search(url)
     if addr_match:
         address = addr_match.group(0).lower()
         try:
@@ -218,6 +260,10 @@ def _extract_pools_from_property(pool_addresses_prop: Dict[str, Any]) -> List[Di
 
 def get_clients_data() -> List[Dict[str, Any]]:
     """Get all clients with their parsed pool data."""
+    cached = _parsed_cache.get("clients")
+    if cached is not None:
+        return list(cached)
+    
     pages = query_database_pages(POOLS_DATABASE_ID)
     clients = []
     
@@ -246,19 +292,33 @@ def get_clients_data() -> List[Dict[str, Any]]:
             "pools": pools
         })
     
-    return clients
+    _parsed_cache.set("clients", clients)
+    return list(clients)
+
+
+async def prefetch_all() -> None:
+    """Warm the Notion caches by loading the whitelist and clients databases concurrently."""
+    try:
+        await asyncio.gather(
+            asyncio.to_thread(get_whitelist_data),
+            asyncio.to_thread(get_clients_data)
+        )
+        logger.info("✅ Notion whitelist and clients prefetched")
+    except Exception as e:
+        logger.warning("⚠️  Notion prefetch failed: %s", e)
 
 
 def get_client_by_key(client_key: str) -> Dict[str, Any] | None:
     """Find a client by normalized client_key (case-insensitive)."""
-    normalized_key = client_key.lower().strip()
-    clients = get_clients_data()
-    
-    for client in clients:
-        if client["client_key"] == normalized_key:
-            return client
+    clients_by_key = _parsed_cache.get("clients_by_key")
+    if clients_by_key is None:
+        clients_by_key = {}
+        for client in get_clients_data():
+            # Keep the first client for a key, like the previous linear scan
+            clients_by_key.setdefault(client["client_key"], client)
+        _parsed_cache.set("clients_by_key", clients_by_key)
     
-    return None
+    return clients_by_key.get(client_key.lower().strip())
 
 
 def get_all_clients() -> List[Dict[str, Any]]:
@@ -268,15 +328,15 @@ def get_all_clients() -> List[Dict[str, Any]]:
 
 def get_user_by_id(user_id: int) -> Dict[str, Any] | None:
     """Get user data from whitelist by user_id."""
-    whitelist = get_whitelist_data()
-    for user in whitelist:
-        # Convert user_id to int for comparison (it might be string from Notion)
-        try:
-            if int(user.get("user_id")) == user_id:
-                return user
-        except (ValueError, TypeError):
-            continue
-    return None
+    whitelist_index = _parsed_cache.get("whitelist_index")
+    if whitelist_index is None:
+        whitelist_index = {}
+        for user in get_whitelist_data():
+            # get_whitelist_data already converts user_id to int
+            whitelist_index.setdefault(user["user_id"], user)
+        _parsed_cache.set("whitelist_index", whitelist_index)
+    
+    return whitelist_index.get(user_id)
 
 if __name__ == "__main__":
     pass
@@ -0,0 +1,270 @@
+"""
+Persistent SQLite cache for historical pool snapshots.
+
+Snapshots are keyed by (pool address, blockchain, timestamp), so a report run
+after a restart can reuse history fetched by an earlier run instead of going
+back to the Balancer API. The cache is opt-in (SNAPSHOT_CACHE_PATH) and all
+SQLite work runs in worker threads, off the event loop.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List
+from config import settings
+from services.balancer_api import BalancerAPI
+
+logger = logging.getLogger(__name__)
+
+# Seconds a pool's stored snapshots are served before being refreshed; the
+# latest snapshot keeps changing until its day is over
+SNAPSHOT_CACHE_TTL = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    pool_address TEXT NOT NULL,
+    blockchain TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    liquidity TEXT NOT NULL,
+    swap_volume TEXT NOT NULL,
+    swap_fees TEXT NOT NULL,
+    PRIMARY KEY (pool_address, blockchain, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS fetches (
+    pool_address TEXT NOT NULL,
+    blockchain TEXT NOT NULL,
+    days_back INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (pool_address, blockchain)
+) WITHOUT ROWID;
+"""
+
+_connection: sqlite3.Connection | None = None
+# Set when the database can't be opened, so later calls skip the cache
+_disabled = False
+# The connection is shared by worker threads; serialize access to it
+_lock = threading.Lock()
+
+
+def _enabled() -> bool:
+    """Return True if the cache is configured and hasn't failed to open."""
+    return bool(settings.snapshot_cache_path) and not _disabled
+
+
+def _get_connection() -> sqlite3.Connection | None:
+    """Open the cache database on first use; None if caching is disabled or unavailable (call under _lock)."""
+    global _connection, _disabled
+    if _connection is None and _enabled():
+        path = os.path.expanduser(settings.snapshot_cache_path)
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            _connection = sqlite3.connect(path, check_same_thread=False)
+            _connection.executescript(_SCHEMA)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("⚠️  Snapshot cache disabled, could not open %s: %s", path, e)
+            _disabled = True
+            _connection = None
+    return _connection
+
+
+def close_snapshot_cache() -> None:
+    """Close the cache database (called on app shutdown)."""
+    global _connection
+    with _lock:
+        if _connection is not None:
+            _connection.close()
+            _connection = None
+
+
+def _load(
+    connection: sqlite3.Connection,
+    pool_address: str,
+    blockchain: str,
+    days_back: int
+) -> List[Dict[str, Any]] | None:
+    """Return stored snapshots if the pool was fetched recently enough, else None."""
+    row = connection.execute(
+        "SELECT days_back, fetched_at FROM fetches WHERE pool_address = ? AND blockchain = ?",
+        (pool_address, blockchain)
+    ).fetchone()
+    if row is None or row[0] < days_back or row[1] < time.time() - SNAPSHOT_CACHE_TTL:
+        return None
+    
+    rows = connection.execute(
+        "SELECT ts, liquidity, swap_volume, swap_fees FROM snapshots "
+        "WHERE pool_address = ? AND blockchain = ? AND ts >= ? ORDER BY ts",
+        (pool_address, blockchain, int(time.time()) - days_back * 86400)
+    ).fetchall()
+    return [
+        {"timestamp": ts, "liquidity": liquidity, "swapVolume": swap_volume, "swapFees": swap_fees}
+        for ts, liquidity, swap_volume, swap_fees in rows
+    ]
+
+
+def _store(
+    connection: sqlite3.Connection,
+    pool_address: str,
+    blockchain: str,
+    days_back: int,
+    snapshots: List[Dict[str, Any]]
+) -> None:
+    """Upsert fetched snapshots and record when the pool was fetched."""
+    with connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    pool_address,
+                    blockchain,
+                    int(s.get("timestamp", 0)),
+                    str(s.get("liquidity", "0")),
+                    str(s.get("swapVolume", "0")),
+                    str(s.get("swapFees", "0"))
+                )
+                for s in snapshots
+            ]
+        )
+        connection.execute(
+            "INSERT OR REPLACE INTO fetches VALUES (?, ?, ?, ?)",
+            (pool_address, blockchain, days_back, time.time())
+        )
+
+
+def _load_cached(pool_address: str, blockchain: str, days_back: int) -> List[Dict[str, Any]] | None:
+    """Open the database if needed and load a pool's stored snapshots (runs in a worker thread)."""
+    with _lock:
+        connection = _get_connection()
+        if connection is None:
+            return None
+        try:
+            return _load(connection, pool_address, blockchain, days_back)
+        except sqlite3.Error as e:
+            logger.warning("⚠️  Snapshot cache read failed for %s: %s", pool_address, e)
+            return None
+
+
+def _fresh_pools(pool_addresses: List[str], blockchain: str, days_back: int) -> set[str]:
+    """Return which of the (lowercased) pools have a fresh fetch on record (runs in a worker thread)."""
+    with _lock:
+        connection = _get_connection()
+        if connection is None or not pool_addresses:
+            return set()
+        placeholders = ", ".join("?" * len(pool_addresses))
+        try:
+            rows = connection.execute(
+                "SELECT pool_address FROM fetches "
+                f"WHERE blockchain = ? AND days_back >= ? AND fetched_at >= ? AND pool_address IN ({placeholders})",
+                (blockchain, days_back, time.time() - SNAPSHOT_CACHE_TTL, *pool_addresses)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("⚠️  Snapshot cache read failed: %s", e)
+            return set()
+        return {row[0] for row in rows}
+
+
+def _store_fetched(
+    pool_address: str,
+    blockchain: str,
+    days_back: int,
+    snapshots: List[Dict[str, Any]]
+) -> None:
+    """Store a pool's fetched snapshots (runs in a worker thread)."""
+    with _lock:
+        connection = _get_connection()
+        if connection is None:
+            return
+        try:
+            _store(connection, pool_address, blockchain, days_back, snapshots)
+        except sqlite3.Error as e:
+            logger.warning("⚠️  Snapshot cache write failed for %s: %s", pool_address, e)
+
+
+async def get_snapshots(
+    api: BalancerAPI,
+    pool_address: str,
+    days_back: int = 30,
+    pool_version: str | None = None,
+    blockchain: str | None = None
+) -> List[Dict[str, Any]]:
+    """
+    Get historical pool snapshots, reading through the persistent cache.
+    
+    Args:
+        api: BalancerAPI used on a cache miss
+        pool_address: Pool address or full pool ID
+        days_back: Number of days of historical data to fetch
+        pool_version: Pool version ("v2" or "v3"), auto-detected if None
+        blockchain: Optional blockchain name (e.g., "ethereum", "arbitrum", "plasma")
+    
+    Returns:
+        List of pool snapshots ordered by ascending timestamp, in the same
+        shape as BalancerAPI.get_pool_snapshots
+    """
+    if not _enabled():
+        return await api.get_pool_snapshots(
+            pool_address,
+            days_back=days_back,
+            pool_version=pool_version,
+            blockchain=blockchain
+        )
+    
+    key_address = pool_address.lower()
+    key_blockchain = (blockchain or settings.blockchain_name).lower()
+    cached = await asyncio.to_thread(_load_cached, key_address, key_blockchain, days_back)
+    if cached:
+        logger.debug("✅ Using %s stored snapshots for %s", len(cached), pool_address)
+        return cached
+    
+    snapshots = await api.get_pool_snapshots(
+        pool_address,
+        days_back=days_back,
+        pool_version=pool_version,
+        blockchain=blockchain
+    )
+    # Empty results may come from a transient failure, so only store hits
+    if snapshots:
+        await asyncio.to_thread(_store_fetched, key_address, key_blockchain, days_back, snapshots)
+    return snapshots
+
+
+async def prefetch_snapshots(
+    api: BalancerAPI,
+    pool_addresses: List[str],
+    days_back: int = 30,
+    blockchain: str | None = None
+) -> None:
+    """
+    Fetch history for several pools in one batched API query, skipping pools
+    that already have fresh stored snapshots. Later get_snapshots calls for
+    these pools are then served from the cache.
+    
+    Args:
+        api: BalancerAPI used for the batched query
+        pool_addresses: Pool addresses
+        days_back: Number of days of historical data to fetch
+        blockchain: Optional blockchain name (e.g., "ethereum", "arbitrum", "plasma")
+    """
+    if not _enabled():
+        await api.get_pool_snapshots_batch(pool_addresses, days_back=days_back, blockchain=blockchain)
+        return
+    
+    key_blockchain = (blockchain or settings.blockchain_name).lower()
+    
+    # Only the fetch records are checked here; the rows themselves are read
+    # later by get_snapshots
+    fresh = await asyncio.to_thread(
+        _fresh_pools, [a.lower() for a in pool_addresses], key_blockchain, days_back
+    )
+    missing = [pool_address for pool_address in pool_addresses if pool_address.lower() not in fresh]
+    if not missing:
+        return
+    
+    snapshots_by_pool = await api.get_pool_snapshots_batch(missing, days_back=days_back, blockchain=blockchain)
+    
+    def _store_all() -> None:
+        for pool_address, snapshots in snapshots_by_pool.items():
+            _store_fetched(pool_address, key_blockchain, days_back, snapshots)
+    
+    await asyncio.to_thread(_store_all)
@@ -1,85 +1,283 @@
-import os
+import asyncio
+import logging
+import time
 import httpx
-from jinja2 import Environment, FileSystemLoader
-from html2image import Html2Image
+import html
+import orjson
+from pathlib import Path
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 from config import settings
+from services import card_renderer
+
+logger = logging.getLogger(__name__)
+
+# Shared Jinja2 environment: card templates are compiled once per process and
+# never re-stat'ed, since TelegramSender is instantiated per request.
+_jinja_env = Environment(
+    loader=FileSystemLoader(str(Path(__file__).parent.parent / "templates")),
+    auto_reload=False,
+    cache_size=-1,
+    # Compiled templates persist in the temp dir, so restarts skip parsing;
+    # prefixed so they never mix with the (autoescaped) email ones
+    bytecode_cache=FileSystemBytecodeCache(pattern="__jinja2_telegram_%s.cache")
+)
+
+# Shared HTTP client so every Telegram call reuses a pooled keep-alive connection
+# to api.telegram.org (TelegramSender is created per request).
+_http_client: httpx.AsyncClient | None = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Return the shared Telegram HTTP client, creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(timeout=30.0, http2=True)
+    return _http_client
+
+
+def _html(value) -> str:
+    """Escape a value for use in an HTML (parse_mode=HTML) Telegram message."""
+    return html.escape(str(value))
+
+
+# Content type for the orjson-encoded sendMessage bodies
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Telegram rejects photo captions longer than this
+_MAX_CAPTION_LENGTH = 1024
+
+
+def _fit_caption(caption: str) -> str:
+    """
+    Trim a photo caption to Telegram's length limit.
+    
+    Whole lines are dropped from the end, so HTML tags (which never span
+    lines in our captions) stay balanced.
+    
+    Args:
+        caption: HTML caption
+    
+    Returns:
+        The caption, unchanged if it already fits
+    """
+    if len(caption) <= _MAX_CAPTION_LENGTH:
+        return caption
+    cut = caption.rfind("\n", 0, _MAX_CAPTION_LENGTH)
+    return caption[:cut] if cut > 0 else caption[:_MAX_CAPTION_LENGTH]
+
+
+class _TokenBucket:
+    """Async token bucket: allows bursts of `capacity` calls, refilled at `rate` per second."""
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# Telegram allows about 30 messages per second per bot; concurrent fan-outs
+# share this bucket so they are paced instead of answered with 429s
+_rate_limiter = _TokenBucket(rate=30, capacity=30)
+
+# Attempts per Telegram call; rate limits (429) and server errors are retried
+# with exponential backoff so an already rendered card isn't thrown away
+_MAX_SEND_ATTEMPTS = 3
+
+
+async def _post_with_retry(url: str, **kwargs) -> httpx.Response:
+    """
+    POST to the Telegram API at the bot's rate limit, retrying on 429/5xx
+    responses and network errors.
+    
+    Args:
+        url: Telegram Bot API method URL
+        **kwargs: Arguments passed to httpx.AsyncClient.post
+    
+    Returns:
+        The last Telegram API response
+    """
+    client = _get_http_client()
+    for attempt in range(_MAX_SEND_ATTEMPTS):
+        last_attempt = attempt == _MAX_SEND_ATTEMPTS - 1
+        delay = 2 ** attempt
+        await _rate_limiter.acquire()
+        try:
+            response = await client.post(url, **kwargs)
+        except httpx.TransportError:
+            if last_attempt:
+                raise
+        else:
+            if last_attempt or (response.status_code != 429 and response.status_code < 500):
+                return response
+            if response.status_code == 429:
+                try:
+                    delay = response.json()["parameters"]["retry_after"]
+                except (ValueError, KeyError, TypeError):
+                    pass
+        await asyncio.sleep(delay)
+
+
+async def _post_json(url: str, payload: dict) -> httpx.Response:
+    """POST an orjson-encoded JSON payload to the Telegram API (with retries)."""
+    return await _post_with_retry(url, content=orjson.dumps(payload), headers=_JSON_HEADERS)
+
+
+async def close_telegram_client() -> None:
+    """Close the shared Telegram HTTP client (called on application shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
 
 class TelegramSender:
     def __init__(self):
         self.bot_token = settings.telegram_bot_token
+        self._enabled = bool(self.bot_token)
         self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
         self.api_url = f"{self.base_url}/sendPhoto"
+        self.message_url = f"{self.base_url}/sendMessage"
         
-        # Try to configure the screenshot tool (might not be available in some environments)
-        try:
-            # Check if we're on Render or similar environment with Chromium installed
-            chromium_path = self._find_chromium()
-            if chromium_path:
-                self.hti = Html2Image(
-                    output_path="temp_images", 
-                    size=(800, 1400),
-                    browser_executable=chromium_path
-                )
-            else:
-                self.hti = Html2Image(output_path="temp_images", size=(800, 1400))
-            
-            self.image_support = True
-            print(f"✅ Image generation enabled (Chrome: {chromium_path or 'auto-detected'})")
-        except Exception as e:
-            print(f"⚠️  Image generation not available: {e}")
-            print("📝 Will send text-only Telegram messages")
-            self.hti = None
-            self.image_support = False
+        # Cards are rendered by a shared headless Chromium (might not be available in some environments)
+        self.image_support = card_renderer.is_available()
+        if not self.image_support:
+            logger.warning("⚠️  Image generation not available: playwright is not installed")
+            logger.info("📝 Will send text-only Telegram messages")
         
         # Setup template environment
-        self.template_env = Environment(loader=FileSystemLoader("templates"))
-        
-        # Ensure temp directory exists
-        os.makedirs("temp_images", exist_ok=True)
-
-    def _find_chromium(self):
-        """Find Chromium executable in common locations."""
-        import shutil
-        
-        # Common Chromium paths on different systems
-        chromium_paths = [
-            '/usr/bin/chromium',           # Render/Ubuntu
-            '/usr/bin/chromium-browser',   # Alternative Ubuntu
-            '/usr/bin/google-chrome',      # If Chrome is installed instead
-            shutil.which('chromium'),      # Try PATH
-            shutil.which('chromium-browser'),
-            shutil.which('google-chrome'),
+        self.template_env = _jinja_env
+        # The lean card only shows the pool header; the metrics go in the caption
+        self.lean_card = settings.telegram_lean_card
+        self._card_template = self.template_env.get_template(
+            "telegram_card_lean.html" if self.lean_card else "telegram_card.html"
+        )
+        self._card_template_multi = self.template_env.get_template("telegram_card_multi.html")
+    
+    async def aclose(self):
+        """Close the shared HTTP client used by all TelegramSender instances."""
+        await close_telegram_client()
+    
+    async def send_message(self, chat_id: str, text: str, parse_mode: str = "Markdown"):
+        """
+        Send a simple text message to a Telegram chat.
+        Used for responding to bot commands like /start and /myid.
+        """
+        response = await _post_json(
+            self.message_url,
+            {"chat_id": chat_id, "text": text, "parse_mode": parse_mode}
+        )
+        
+        if response.status_code == 200:
+            logger.info("✅ Telegram message sent to chat %s", chat_id)
+        else:
+            logger.error("❌ Failed to send Telegram message: %s", response.text)
+        
+        return response
+    
+    def _build_single_caption(self, metrics_data: dict, with_changes: bool = False) -> str:
+        """
+        Build the HTML caption for a single-pool report.
+        
+        Args:
+            metrics_data: Formatted metrics dictionary
+            with_changes: Include volume/fees change percentages (used when there is no card)
+        
+        Returns:
+            Caption text for parse_mode=HTML
+        """
+        get = metrics_data.get
+        volume = _html(get('volume_15d', 'N/A'))
+        fees = _html(get('fees_15d', 'N/A'))
+        if with_changes:
+            volume = f"{volume} ({_html(get('volume_change_percent', '0%'))})"
+            fees = f"{fees} ({_html(get('fees_change_percent', '0%'))})"
+        return (
+            f"💎 <b>Pool Performance Update</b>\n"
+            f"<b>{_html(get('pool_name', 'Unknown Pool'))}</b>\n\n"
+            f"💰 <b>TVL:</b> {_html(get('tvl_current', 'N/A'))} ({_html(get('tvl_change_percent', '0%'))})\n"
+            f"📊 <b>Volume (15d):</b> {volume}\n"
+            f"💸 <b>Fees (15d):</b> {fees}\n"
+            f"🚀 <b>APR:</b> {_html(get('apr_current', 'N/A'))}\n\n"
+            f"<a href=\"{_html(get('pool_url', '#'))}\">🔗 View Pool on Balancer</a>"
+        )
+    
+    def _build_multi_caption(self, metrics_data: dict) -> str:
+        """
+        Build the HTML caption for a multi-pool report.
+        
+        Args:
+            metrics_data: Formatted multi-pool metrics dictionary
+        
+        Returns:
+            Caption text for parse_mode=HTML
+        """
+        get = metrics_data.get
+        caption_lines = [
+            "📊 <b>Pools Comparison Update</b>",
+            f"<b>{_html(get('pool_count', 0))} Pools • 15-Day Analysis</b>",
+            "",
+            f"💰 <b>Total Fees (15d):</b> {_html(get('total_fees', 'N/A'))}",
+            f"🚀 <b>Weighted Avg APR:</b> {_html(get('total_apr', 'N/A'))}",
         ]
         
-        for path in chromium_paths:
-            if path and os.path.exists(path):
-                return path
+        top_vol = get("top_3_volume", [])[:3]
+        if top_vol:
+            caption_lines.append("")
+            caption_lines.append("🏆 <b>Top 3 by Trading Volume</b>")
+            for p in top_vol:
+                caption_lines.append(_html(f"{p.get('rank')}. {p.get('name')} — {p.get('value')} ({p.get('percentage')} of total)"))
         
-        return None
+        top_tvl = get("top_3_tvl", [])[:3]
+        if top_tvl:
+            caption_lines.append("")
+            caption_lines.append("💎 <b>Top 3 by TVL Growth</b>")
+            for p in top_tvl:
+                caption_lines.append(_html(f"{p.get('rank')}. {p.get('name')} — {p.get('value')} ({p.get('percentage')})"))
+        
+        return "\n".join(caption_lines)
     
-    async def send_message(self, chat_id: str, text: str):
+    async def _post_photo(self, chat_id: str, image_bytes: bytes, caption: str):
         """
-        Send a simple text message to a Telegram chat.
-        Used for responding to bot commands like /start and /myid.
+        Upload a rendered card to a Telegram chat with an HTML caption.
+        
+        Args:
+            chat_id: Chat ID to send to
+            image_bytes: JPEG image bytes
+            caption: HTML caption
+        
+        Returns:
+            The Telegram API response
         """
-        url = f"{self.base_url}/sendMessage"
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json={
-                "chat_id": chat_id,
-                "text": text,
-                "parse_mode": "Markdown"
-            })
-            
-            if response.status_code == 200:
-                print(f"✅ Telegram message sent to chat {chat_id}")
-            else:
-                print(f"❌ Failed to send Telegram message: {response.text}")
-            
-            return response
-
+        response = await _post_with_retry(
+            self.api_url,
+            data={"chat_id": chat_id, "caption": _fit_caption(caption), "parse_mode": "HTML"},
+            files={"photo": ("card.jpg", image_bytes, "image/jpeg")}
+        )
+        
+        if response.status_code == 200:
+            logger.info("✅ Telegram photo sent to chat %s", chat_id)
+        else:
+            logger.error("❌ Failed to send Telegram photo to chat %s: %s", chat_id, response.text)
+        
+        return response
+    
     async def send_pool_report(self, pool_data: dict, metrics_data: dict, chat_id: str):
         """
-        Generates an image card and sends it to Telegram with Markdown text.
+        Generates an image card and sends it to Telegram with an HTML caption.
         Falls back to text-only if image generation is not available.
         
         Args:
@@ -87,74 +285,41 @@ class TelegramSender:
             metrics_data: Formatted metrics dictionary
             chat_id: Chat ID to send to (required)
         """
+        if not self._enabled or not chat_id:
+            logger.warning("⚠️  Telegram not configured; skipping report")
+            return
+        
+        chat_id = str(chat_id)
         try:
-            target_chat_id = chat_id
-            
             # If image generation is not available, send text-only message
             if not self.image_support:
-                print("📝 Sending text-only Telegram message...")
-                caption = (
-                    f"💎 *Pool Performance Update*\n"
-                    f"*{metrics_data.get('pool_name', 'Unknown Pool')}*\n\n"
-                    f"💰 *TVL:* {metrics_data.get('tvl_current', 'N/A')} ({metrics_data.get('tvl_change_percent', '0%')})\n"
-                    f"📊 *Volume (15d):* {metrics_data.get('volume_15d', 'N/A')} ({metrics_data.get('volume_change_percent', '0%')})\n"
-                    f"💸 *Fees (15d):* {metrics_data.get('fees_15d', 'N/A')} ({metrics_data.get('fees_change_percent', '0%')})\n"
-                    f"🚀 *APR:* {metrics_data.get('apr_current', 'N/A')}\n\n"
-                    f"[🔗 View Pool on Balancer]({metrics_data.get('pool_url', '#')})"
-                )
-                await self.send_message(str(target_chat_id), caption)
+                logger.info("📝 Sending text-only Telegram message...")
+                caption = self._build_single_caption(metrics_data, with_changes=True)
+                await self.send_message(chat_id, caption, parse_mode="HTML")
                 return
             
-            print("🎨 Generating Telegram report card...")
+            logger.info("🎨 Generating Telegram report card...")
             
-            # 1. Render HTML for the Image
+            # 1. Render HTML for the Image (in a worker thread, off the event loop)
             full_context = {**pool_data, **metrics_data}
-            template = self.template_env.get_template("telegram_card.html")
-            html_content = template.render(full_context)
+            html_content = await asyncio.to_thread(self._card_template.render, full_context)
             
-            # 2. Convert HTML to PNG Image
-            # Using pool ID in filename to avoid conflicts
-            image_filename = f"report_{metrics_data.get('pool_id', 'temp')}.png"
-            self.hti.screenshot(html_str=html_content, save_as=image_filename)
-            image_path = os.path.join("temp_images", image_filename)
+            # 2. Convert HTML to a JPEG Image (in memory, no temp file)
+            image_bytes = await card_renderer.render_card(html_content, fit_content=self.lean_card)
+            
+            # 3. Prepare HTML Caption
+            caption = self._build_single_caption(metrics_data, with_changes=self.lean_card)
             
-            # 3. Prepare Markdown Caption
-            # Simple Markdown formatting for Telegram
-            caption = (
-                f"💎 *Pool Performance Update*\n"
-                f"*{metrics_data.get('pool_name', 'Unknown Pool')}*\n\n"
-                f"💰 *TVL:* {metrics_data.get('tvl_current', 'N/A')} ({metrics_data.get('tvl_change_percent', '0%')})\n"
-                f"📊 *Volume (15d):* {metrics_data.get('volume_15d', 'N/A')}\n"
-                f"💸 *Fees (15d):* {metrics_data.get('fees_15d', 'N/A')}\n"
-                f"🚀 *APR:* {metrics_data.get('apr_current', 'N/A')}\n\n"
-                f"[🔗 View Pool on Balancer]({metrics_data.get('pool_url', '#')})"
-            )
-
             # 4. Send to Telegram
-            print(f"✈️ Sending to Telegram Chat ID: {target_chat_id}...")
-            async with httpx.AsyncClient() as client:
-                with open(image_path, "rb") as img_file:
-                    response = await client.post(
-                        self.api_url,
-                        data={"chat_id": target_chat_id, "caption": caption, "parse_mode": "Markdown"},
-                        files={"photo": img_file}
-                    )
-                    
-                if response.status_code == 200:
-                    print("✅ Telegram message sent successfully!")
-                else:
-                    print(f"❌ Failed to send Telegram message: {response.text}")
-
-            # Cleanup: Remove the temp image
-            if os.path.exists(image_path):
-                os.remove(image_path)
-                
+            logger.info("✈️ Sending to Telegram Chat ID: %s...", chat_id)
+            await self._post_photo(chat_id, image_bytes, caption)
+        
         except Exception as e:
-            print(f"❌ Error in TelegramSender: {str(e)}")
-
+            logger.error("❌ Error in TelegramSender: %s", e)
+    
     async def send_multi_pool_report(self, metrics_data: dict, chat_id: str):
         """
-        Generates a multi-pool comparison image card and sends it to Telegram with Markdown text.
+        Generates a multi-pool comparison image card and sends it to Telegram with an HTML caption.
         Falls back to text-only if image generation is not available.
         Expects metrics_data to match MetricsCalculator.format_multi_pool_metrics_for_email output.
         
@@ -162,92 +327,33 @@ class TelegramSender:
             metrics_data: Formatted multi-pool metrics dictionary
             chat_id: Chat ID to send to (required)
         """
+        if not self._enabled or not chat_id:
+            logger.warning("⚠️  Telegram not configured; skipping report")
+            return
+        
+        chat_id = str(chat_id)
         try:
-            target_chat_id = chat_id
-            
             # If image generation is not available, send text-only message
             if not self.image_support:
-                print("📝 Sending text-only Telegram multi-pool message...")
-                caption_lines = [
-                    "📊 *Pools Comparison Update*",
-                    f"*{metrics_data.get('pool_count', 0)} Pools • 15-Day Analysis*",
-                    "",
-                    f"💰 *Total Fees (15d):* {metrics_data.get('total_fees', 'N/A')}",
-                    f"🚀 *Weighted Avg APR:* {metrics_data.get('total_apr', 'N/A')}",
-                ]
-                
-                top_vol = metrics_data.get("top_3_volume", [])[:3]
-                if top_vol:
-                    caption_lines.append("")
-                    caption_lines.append("🏆 *Top 3 by Trading Volume*")
-                    for p in top_vol:
-                        caption_lines.append(f"{p.get('rank')}. {p.get('name')} — {p.get('value')} ({p.get('percentage')} of total)")
-                
-                top_tvl = metrics_data.get("top_3_tvl", [])[:3]
-                if top_tvl:
-                    caption_lines.append("")
-                    caption_lines.append("💎 *Top 3 by TVL Growth*")
-                    for p in top_tvl:
-                        caption_lines.append(f"{p.get('rank')}. {p.get('name')} — {p.get('value')} ({p.get('percentage')})")
-                
-                caption = "\n".join(caption_lines)
-                await self.send_message(str(target_chat_id), caption)
+                logger.info("📝 Sending text-only Telegram multi-pool message...")
+                caption = self._build_multi_caption(metrics_data)
+                await self.send_message(chat_id, caption, parse_mode="HTML")
                 return
             
-            print("🎨 Generating Telegram multi-pool report card...")
-
-            # 1. Render HTML for the Image
-            template = self.template_env.get_template("telegram_card_multi.html")
-            html_content = template.render(**metrics_data)
-
-            # 2. Convert HTML to PNG Image
-            image_filename = f"report_multi_{metrics_data.get('pool_count', 'n')}.png"
-            self.hti.screenshot(html_str=html_content, save_as=image_filename)
-            image_path = os.path.join("temp_images", image_filename)
-
-            # 3. Prepare Markdown Caption
-            caption_lines = [
-                "📊 *Pools Comparison Update*",
-                f"*{metrics_data.get('pool_count', 0)} Pools • 15-Day Analysis*",
-                "",
-                f"💰 *Total Fees (15d):* {metrics_data.get('total_fees', 'N/A')}",
-                f"🚀 *Weighted Avg APR:* {metrics_data.get('total_apr', 'N/A')}",
-            ]
-
-            top_vol = metrics_data.get("top_3_volume", [])[:3]
-            if top_vol:
-                caption_lines.append("")
-                caption_lines.append("🏆 *Top 3 by Trading Volume*")
-                for p in top_vol:
-                    caption_lines.append(f"{p.get('rank')}. {p.get('name')} — {p.get('value')} ({p.get('percentage')} of total)")
-
-            top_tvl = metrics_data.get("top_3_tvl", [])[:3]
-            if top_tvl:
-                caption_lines.append("")
-                caption_lines.append("💎 *Top 3 by TVL Growth*")
-                for p in top_tvl:
-                    caption_lines.append(f"{p.get('rank')}. {p.get('name')} — {p.get('value')} ({p.get('percentage')})")
-
-            caption = "\n".join(caption_lines)
-
+            logger.info("🎨 Generating Telegram multi-pool report card...")
+            
+            # 1. Render HTML for the Image (in a worker thread, off the event loop)
+            html_content = await asyncio.to_thread(self._card_template_multi.render, metrics_data)
+            
+            # 2. Convert HTML to a JPEG Image (in memory, no temp file)
+            image_bytes = await card_renderer.render_card(html_content)
+            
+            # 3. Prepare HTML Caption
+            caption = self._build_multi_caption(metrics_data)
+            
             # 4. Send to Telegram
-            print(f"✈️ Sending multi-pool card to Telegram Chat ID: {target_chat_id}...")
-            async with httpx.AsyncClient() as client:
-                with open(image_path, "rb") as img_file:
-                    response = await client.post(
-                        self.api_url,
-                        data={"chat_id": target_chat_id, "caption": caption, "parse_mode": "Markdown"},
-                        files={"photo": img_file}
-                    )
-
-                if response.status_code == 200:
-                    print("✅ Telegram multi-pool message sent successfully!")
-                else:
-                    print(f"❌ Failed to send Telegram multi-pool message: {response.text}")
-
-            # Cleanup
-            if os.path.exists(image_path):
-                os.remove(image_path)
-
+            logger.info("✈️ Sending multi-pool card to Telegram Chat ID: %s...", chat_id)
+            await self._post_photo(chat_id, image_bytes, caption)
+        
         except Exception as e:
-            print(f"❌ Error in TelegramSender (multi-pool): {str(e)}")
\ No newline at end of file
+            logger.error("❌ Error in TelegramSender (multi-pool): %s", e)
\ No newline at end of file
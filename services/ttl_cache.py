@@ -0,0 +1,72 @@
+"""
+Small in-memory TTL cache used to avoid re-querying slowly changing data.
+"""
+import threading
+import time
+from typing import Any, Dict, Hashable, Tuple
+
+
+class TTLCache:
+    """
+    Dictionary-backed cache whose entries expire after a fixed time-to-live.
+    
+    Safe to share between threads: every access to the entries holds a lock.
+    """
+    
+    def __init__(self, ttl: float, maxsize: int = 256):
+        """
+        Initialize the cache.
+        
+        Args:
+            ttl: Seconds an entry stays valid after being stored
+            maxsize: Maximum number of entries; the oldest is evicted when full
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Any | None:
+        """
+        Return the cached value for key, or None if missing or expired.
+        
+        Args:
+            key: Cache key
+        
+        Returns:
+            Cached value or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            
+            return value
+    
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value under key for the cache's TTL.
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            if len(self._entries) >= self.maxsize:
+                # Dicts keep insertion order, so the first key is the oldest entry
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+    
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -21,11 +21,19 @@ async def test_balancer_api():
     try:
         # Initialize API
         api = BalancerAPI()
+        calculator = MetricsCalculator()
+        
+        # Tests 1-3 are independent, so fetch their data concurrently
+        print("Fetching pool data, snapshots and metrics concurrently...\n")
+        current_pool, snapshots, metrics = await asyncio.gather(
+            api.get_current_pool_data(pool_address),
+            api.get_pool_snapshots(pool_address, days_back=30),
+            calculator.calculate_pool_metrics(pool_address)
+        )
         
         # Test 1: Get current pool data
-        print("Test 1: Fetching current pool data from Balancer V3 API...")
+        print("Test 1: Current pool data from Balancer V3 API")
         print("-" * 70)
-        current_pool = await api.get_current_pool_data(pool_address)
         print(f"✅ Pool Name: {current_pool.get('name')}")
         print(f"✅ Pool Type: {current_pool.get('type')}")
         print(f"✅ Pool Version: {current_pool.get('version')}")
@@ -42,9 +50,8 @@ async def test_balancer_api():
                 print(f"   - {item.get('title')}: {float(item.get('apr', 0)) * 100:.2f}% ({item.get('type')})")
         
         # Test 2: Get historical snapshots
-        print("\n\nTest 2: Fetching historical snapshots from V2 Subgraph...")
+        print("\n\nTest 2: Historical snapshots")
         print("-" * 70)
-        snapshots = await api.get_pool_snapshots(pool_address, days_back=30)
         print(f"✅ Found {len(snapshots)} snapshots")
         
         if snapshots:
@@ -54,10 +61,8 @@ async def test_balancer_api():
             print(f"✅ Newest snapshot: {newest.get('timestamp')} (Liquidity: ${float(newest.get('liquidity', 0)):,.2f})")
         
         # Test 3: Calculate metrics
-        print("\n\nTest 3: Calculating comprehensive metrics...")
+        print("\n\nTest 3: Comprehensive metrics")
         print("-" * 70)
-        calculator = MetricsCalculator()
-        metrics = await calculator.calculate_pool_metrics(pool_address)
         
         print(f"✅ Pool Name: {metrics.pool_name}")
         print(f"✅ TVL Current: ${metrics.tvl_current:,.2f}")
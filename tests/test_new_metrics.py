@@ -10,9 +10,10 @@ from services.metrics_calculator import MetricsCalculator
 
 async def test_single_v2_pool():
     """Test fetching single V2 pool with new metrics."""
-    print("=" * 60)
-    print("Testing Single Pool (V2)")
-    print("=" * 60)
+    out = []
+    out.append("=" * 60)
+    out.append("Testing Single Pool (V2)")
+    out.append("=" * 60)
     
     pool_address = "0x3de27efa2f1aa663ae5d458857e731c129069f29"
     
@@ -20,32 +21,35 @@ async def test_single_v2_pool():
         calculator = MetricsCalculator()
         metrics = await calculator.calculate_pool_metrics(pool_address)
         
-        print(f"\n✅ Pool: {metrics.pool_name}")
-        print(f"   Type: {metrics.pool_type}")
-        print(f"   Swap Fee: {metrics.swap_fee * 100:.4f}%")
-        print(f"   APR: {metrics.apr_current * 100:.2f}%" if metrics.apr_current else "   APR: N/A")
-        print(f"   TVL: ${metrics.tvl_current:,.2f} ({metrics.tvl_change_percent:+.2f}%)")
-        print(f"   Volume (15d): ${metrics.volume_15_days:,.2f} ({metrics.volume_change_percent:+.2f}%)")
-        print(f"   Fees (15d): ${metrics.fees_15_days:,.2f} ({metrics.fees_change_percent:+.2f}%)")
+        out.append(f"\n✅ Pool: {metrics.pool_name}")
+        out.append(f"   Type: {metrics.pool_type}")
+        out.append(f"   Swap Fee: {metrics.swap_fee * 100:.4f}%")
+        out.append(f"   APR: {metrics.apr_current * 100:.2f}%" if metrics.apr_current else "   APR: N/A")
+        out.append(f"   TVL: ${metrics.tvl_current:,.2f} ({metrics.tvl_change_percent:+.2f}%)")
+        out.append(f"   Volume (15d): ${metrics.volume_15_days:,.2f} ({metrics.volume_change_percent:+.2f}%)")
+        out.append(f"   Fees (15d): ${metrics.fees_15_days:,.2f} ({metrics.fees_change_percent:+.2f}%)")
         
         if metrics.token_weights:
-            print(f"   Weights: {metrics.token_weights}")
+            out.append(f"   Weights: {metrics.token_weights}")
         
         if metrics.boosted_apr:
-            print(f"   Boosted APR: {metrics.boosted_apr * 100:.2f}%")
+            out.append(f"   Boosted APR: {metrics.boosted_apr * 100:.2f}%")
         
-        print(f"   URL: {metrics.pool_url}")
+        out.append(f"   URL: {metrics.pool_url}")
         
     except Exception as e:
-        print(f"❌ Error: {str(e)}")
+        out.append(f"❌ Error: {str(e)}")
         import traceback
-        traceback.print_exc()
+        out.append(traceback.format_exc())
+    
+    return "\n".join(out)
 
 async def test_multi_pool():
     """Test fetching multiple pools with rankings."""
-    print("\n" + "=" * 60)
-    print("Testing Multiple Pools")
-    print("=" * 60)
+    out = []
+    out.append("\n" + "=" * 60)
+    out.append("Testing Multiple Pools")
+    out.append("=" * 60)
     
     pool_addresses = [
         "0x3de27efa2f1aa663ae5d458857e731c129069f29",
@@ -60,29 +64,32 @@ async def test_multi_pool():
             ranking_by=["swap_fee"]
         )
         
-        print(f"\n✅ Processed {len(multi_metrics.pools)} pools")
-        print(f"   Total Fees: ${multi_metrics.total_fees:,.2f}")
-        print(f"   Weighted APR: {multi_metrics.total_apr * 100:.2f}%")
+        out.append(f"\n✅ Processed {len(multi_metrics.pools)} pools")
+        out.append(f"   Total Fees: ${multi_metrics.total_fees:,.2f}")
+        out.append(f"   Weighted APR: {multi_metrics.total_apr * 100:.2f}%")
         
-        print("\nTop 3 by Volume:")
+        out.append("\nTop 3 by Volume:")
         for name, volume, pct, url in multi_metrics.top_3_by_volume:
-            print(f"   - {name}: ${volume:,.2f} ({pct:.1f}%)")
+            out.append(f"   - {name}: ${volume:,.2f} ({pct:.1f}%)")
         
         if "swap_fee" in multi_metrics.custom_rankings:
-            print("\nTop 3 by Swap Fee:")
+            out.append("\nTop 3 by Swap Fee:")
             for name, fee, url in multi_metrics.custom_rankings["swap_fee"]:
-                print(f"   - {name}: {fee * 100:.2f}%")
+                out.append(f"   - {name}: {fee * 100:.2f}%")
         
     except Exception as e:
-        print(f"❌ Error: {str(e)}")
+        out.append(f"❌ Error: {str(e)}")
         import traceback
-        traceback.print_exc()
+        out.append(traceback.format_exc())
+    
+    return "\n".join(out)
 
 async def test_single_v3_pool():
     """Test fetching single V3 pool with new metrics."""
-    print("\n" + "=" * 60)
-    print("Testing Single Pool (V3)")
-    print("=" * 60)
+    out = []
+    out.append("\n" + "=" * 60)
+    out.append("Testing Single Pool (V3)")
+    out.append("=" * 60)
     
     pool_address = "0x85b2b559bc2d21104c4defdd6efca8a20343361d"
     
@@ -90,32 +97,38 @@ async def test_single_v3_pool():
         calculator = MetricsCalculator()
         metrics = await calculator.calculate_pool_metrics(pool_address)
         
-        print(f"\n✅ Pool: {metrics.pool_name}")
-        print(f"   Type: {metrics.pool_type}")
-        print(f"   Swap Fee: {metrics.swap_fee * 100:.4f}%")
-        print(f"   APR: {metrics.apr_current * 100:.2f}%" if metrics.apr_current else "   APR: N/A")
-        print(f"   TVL: ${metrics.tvl_current:,.2f} ({metrics.tvl_change_percent:+.2f}%)")
-        print(f"   Volume (15d): ${metrics.volume_15_days:,.2f} ({metrics.volume_change_percent:+.2f}%)")
-        print(f"   Fees (15d): ${metrics.fees_15_days:,.2f} ({metrics.fees_change_percent:+.2f}%)")
+        out.append(f"\n✅ Pool: {metrics.pool_name}")
+        out.append(f"   Type: {metrics.pool_type}")
+        out.append(f"   Swap Fee: {metrics.swap_fee * 100:.4f}%")
+        out.append(f"   APR: {metrics.apr_current * 100:.2f}%" if metrics.apr_current else "   APR: N/A")
+        out.append(f"   TVL: ${metrics.tvl_current:,.2f} ({metrics.tvl_change_percent:+.2f}%)")
+        out.append(f"   Volume (15d): ${metrics.volume_15_days:,.2f} ({metrics.volume_change_percent:+.2f}%)")
+        out.append(f"   Fees (15d): ${metrics.fees_15_days:,.2f} ({metrics.fees_change_percent:+.2f}%)")
         
         if metrics.token_weights:
-            print(f"   Weights: {metrics.token_weights}")
+            out.append(f"   Weights: {metrics.token_weights}")
         
         if metrics.boosted_apr:
-            print(f"   Boosted APR: {metrics.boosted_apr * 100:.2f}%")
+            out.append(f"   Boosted APR: {metrics.boosted_apr * 100:.2f}%")
         
-        print(f"   URL: {metrics.pool_url}")
+        out.append(f"   URL: {metrics.pool_url}")
         
     except Exception as e:
-        print(f"❌ Error: {str(e)}")
+        out.append(f"❌ Error: {str(e)}")
         import traceback
-        traceback.print_exc()
+        out.append(traceback.format_exc())
+    
+    return "\n".join(out)
 
 async def main():
-    """Run all tests."""
-    await test_single_v2_pool()
-    await test_single_v3_pool()
-    await test_multi_pool()
+    """Run all tests concurrently, printing each one's output in order."""
+    results = await asyncio.gather(
+        test_single_v2_pool(),
+        test_single_v3_pool(),
+        test_multi_pool()
+    )
+    for output in results:
+        print(output)
 
 if __name__ == "__main__":
     asyncio.run(main())